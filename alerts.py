@@ -0,0 +1,146 @@
+"""
+Asynchronous, coalescing alert dispatcher for autoscale.py.
+
+send() only enqueues; a background thread publishes, so a slow or throttled SNS
+call never delays a scaling decision. Alerts are rate-limited per subject: the
+first alert for a subject goes out immediately, and anything with the same
+subject inside the following window is held back and sent as one coalesced
+message when the window ends, with identical messages counted instead of
+repeated. Messages are built under the dispatcher's lock but published outside
+it, so a slow SNS call never holds up snapshot() at the end of a tick. The per-subject
+state is plain JSON so cron runs can persist it between ticks; drain() waits for
+queued alerts to be processed (cron runs call it before exiting, long-running
+processes leave alerts to the dispatcher thread), and flush_all() publishes
+everything still held back (used at daemon shutdown). Several scaling
+groups can share the dispatcher: each registers its publish function (its own SNS
+topic) for its subject prefix, and every alert, including held-back ones restored
+from persisted state, goes out through the function of the longest registered
+prefix of its subject. Subjects no registered prefix matches are held until one is.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_lock = threading.Lock()
+_worker = None
+_window = 900
+# {subject prefix: publish function}
+_publishers = {}
+# {subject: {'last_sent': epoch seconds, 'pending': {message: count}}}
+_state = {}
+
+
+def start(publish, window, state=None, prefix=''):
+    """
+    Start the dispatcher once per process and register `publish(subject, message)` as the
+    send function for subjects starting with `prefix`. `window` is the per-subject rate-limit
+    window in seconds (taken from the first call) and `state` is persisted state from an
+    earlier run. Later calls only add subjects from `state` that are not known yet.
+    """
+    global _worker, _window
+    with _lock:
+        _publishers[prefix] = publish
+        for subject, entry in (state or {}).items():
+            _state.setdefault(subject, {'last_sent': entry['last_sent'], 'pending': dict(entry['pending'])})
+        if _worker is not None:
+            return
+        _window = window
+        _worker = threading.Thread(target=_run, name='alert-dispatcher', daemon=True)
+        _worker.start()
+
+
+def send(subject, message):
+    # Queue an alert; returns immediately.
+    _queue.put((subject, message, time.time()))
+
+
+def drain(timeout=None):
+    """
+    Wait until every queued alert has been processed (published if its subject is not
+    rate-limited, held back otherwise). Returns False if `timeout` expired first.
+    """
+    if _worker is None:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if deadline is not None and time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def flush_all(timeout=10):
+    # Process the queue, then publish every held-back alert regardless of the rate limit.
+    drain(timeout)
+    with _lock:
+        messages = [_take_message(subject, time.time()) for subject, entry in _state.items()
+                    if entry['pending'] and _publisher(subject)]
+    _send(messages)
+
+
+def snapshot(prefix=''):
+    # Copy of the per-subject state (of subjects starting with `prefix`), for persisting between cron runs.
+    with _lock:
+        return {subject: {'last_sent': entry['last_sent'], 'pending': dict(entry['pending'])}
+                for subject, entry in _state.items() if subject.startswith(prefix)}
+
+
+def _run():
+    while True:
+        try:
+            subject, message, received = _queue.get(timeout=1)
+        except queue.Empty:
+            _publish_due(time.time())
+            continue
+        try:
+            with _lock:
+                entry = _state.setdefault(subject, {'last_sent': 0, 'pending': {}})
+                entry['pending'][message] = entry['pending'].get(message, 0) + 1
+            _publish_due(received)
+        finally:
+            _queue.task_done()
+
+
+def _publisher(subject):
+    # Publish function registered for the longest prefix of `subject`, or None; caller holds _lock.
+    prefixes = [prefix for prefix in _publishers if subject.startswith(prefix)]
+    return _publishers[max(prefixes, key=len)] if prefixes else None
+
+
+def _publish_due(now):
+    # Publish every subject whose rate-limit window has passed and that has alerts waiting.
+    with _lock:
+        messages = [_take_message(subject, now) for subject, entry in _state.items()
+                    if entry['pending'] and now - entry['last_sent'] >= _window and _publisher(subject)]
+    _send(messages)
+
+
+def _take_message(subject, now):
+    # (publish, subject, coalesced message) for `subject`, marking its alerts sent; caller holds _lock.
+    entry = _state[subject]
+    pending = entry['pending']
+    if len(pending) == 1 and next(iter(pending.values())) == 1:
+        body = next(iter(pending))
+    else:
+        total = sum(pending.values())
+        since = datetime.fromtimestamp(entry['last_sent'], timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC') if entry['last_sent'] else None
+        header = f"{total} alerts" + (f" since {since}" if since else "") + ":"
+        body = "\n".join([header] + [f"- {message}" + (f" (x{count})" if count > 1 else "")
+                                     for message, count in pending.items()])
+    entry['pending'] = {}
+    entry['last_sent'] = now
+    return _publisher(subject), subject, body
+
+
+def _send(messages):
+    # Publish outside _lock, so a slow SNS call never blocks snapshot() or another subject's publish.
+    for publish, subject, body in messages:
+        try:
+            publish(subject, body)
+        except Exception as e:
+            logger.error(f"Failed to publish alert '{subject}': {e}")
@@ -0,0 +1,32 @@
+"""
+Load-simulation web app run on every instance behind the ALB.
+
+/ busy-loops for half a second to generate CPU load; /health is the ALB health check.
+autoscale.py ships this file to new instances in their user data and serves it
+under gunicorn (gunicorn_conf.py) with several worker processes, so a CPU-bound
+request no longer blocks /health the way Flask's single-process development
+server did. `python app.py` still runs the development server for local testing.
+"""
+import os
+import time
+
+from flask import Flask
+
+app = Flask(__name__)
+
+
+@app.route("/health")
+def health_check():
+    return "OK", 200
+
+
+@app.route("/")
+def cpu_burner():
+    start = time.time()
+    while time.time() - start < 0.5:
+        pass
+    return "CPU-intensive response"
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.environ.get("APP_PORT", 80)))
@@ -1,9 +1,23 @@
 import boto3
+from botocore.config import Config
+import numpy as np
 from datetime import datetime, timedelta, timezone
 import pytz
 import time
 import json
+import hashlib
 import logging
+import os
+import argparse
+import signal
+import threading
+
+import alerts
+import capacity
+import forecast
+import metric_store
+import policies
+import tracing
 
 # --- Logging setup ---
 # Configure structured logging to track script execution with timestamps and log levels
@@ -25,25 +39,290 @@ ami_id = 'ami-0c1ac8a41498c1a9c'
 instance_type = 't3.micro'
 security_group_id = 'sg-0457955da20e50a9e'
 key_name = 'salamikey'
+subnet_id = None  # launch into this subnet; None uses the default subnet of the security group's VPC
 target_group_arn = 'arn:aws:elasticloadbalancing:eu-north-1:135699253595:targetgroup/TG1/2b00c3a319ad7c42'
 
+# Web app run on every instance (app.py), shipped in the user data. app_server selects how it is served:
+# 'gunicorn' runs gunicorn_conf.py's multi-process pool, 'flask' the single-process development server
+app_server = 'gunicorn'
+app_start_commands = {
+    'gunicorn': '/home/ubuntu/venv/bin/gunicorn -c /home/ubuntu/gunicorn_conf.py --chdir /home/ubuntu app:app',
+    'flask': '/home/ubuntu/venv/bin/python /home/ubuntu/app.py',
+}
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')) as f:
+    app_source = f.read()
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn_conf.py')) as f:
+    gunicorn_conf_source = f.read()
+
+# User data to bootstrap new instances with the Flask app for load simulation. None builds the
+# bootstrap for app_server when launching (see get_user_data_script()).
+user_data_script = None
+
+# Warm pool instances run the same bootstrap, then stop themselves once it has finished;
+# from a bootstrapped image (ami_is_bootstrapped) they only need to stop. None appends the
+# shutdown to the bootstrap of user_data_script.
+warm_pool_user_data_script = None
+warm_pool_bootstrapped_user_data_script = "#!/bin/bash\nshutdown -h now\n"
+
+# Warm pool: keep this many bootstrapped, stopped instances ready for scale_up() to start
+warm_pool_size = 1
+warm_pool_tag_key = 'WarmPool'
+warm_pool_bootstrap_timeout = 900  # seconds before a pool instance that never stopped is terminated
+
+# Set ami_is_bootstrapped once ami_id points at an image baked with --bake-ami; launches then skip user data
+ami_is_bootstrapped = False
+
 # Tag for identifying primary (non-scalable) instance
 primary_tag_key = 'Role'
 primary_tag_value = 'Primary'
 
+# Server-side scope of this group's inventory. Every instance the controller manages uses
+# security_group_id; scale_up() also tags launches with group_tag_key so the filter can be
+# narrowed to [{'Name': f'tag:{group_tag_key}', 'Values': [group_tag_value]}] once the
+# primary instance carries the tag as well.
+group_tag_key = 'ScalingGroup'
+group_tag_value = 'TG1'  # multi_group.py defaults it to the group's name
+inventory_filters = None  # None filters on security_group_id
+
 # Timezone setting for UK-localized logs
 uk_tz = pytz.timezone("Europe/London")
 
-# Initialize AWS service clients
-cloudwatch = boto3.client('cloudwatch', region_name=region)
-ec2 = boto3.client('ec2', region_name=region)
-sns = boto3.client('sns', region_name=region)
-elbv2 = boto3.client('elbv2', region_name=region)
+# Pending scale-up state, persisted between ticks (and cron runs)
+pending_launches_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pending_launches.json')
+launch_timeout = 600  # seconds from request to healthy before a launch is marked failed
+# Per-instance provision-to-healthy latency (JSON lines), to compare warm pool hits with cold launches
+provision_log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'provision_latency.jsonl')
+LAUNCH_REQUESTED = 'requested'
+LAUNCH_RUNNING = 'running'
+LAUNCH_REGISTERED = 'registered'
+LAUNCH_HEALTHY = 'healthy'
+LAUNCH_FAILED = 'failed'
+
+# Pending scale-in state: instances deregistered from the target group and waiting for the
+# ALB to drain in-flight requests before they are stopped. drain_timeout should exceed the
+# target group's deregistration delay (300s by default); instances are stopped after it regardless.
+pending_drains_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pending_drains.json')
+drain_timeout = 360
+
+# Scaling thresholds on the fleet's 5-minute average load (CPU utilization %, or the
+# CPU-equivalent load combined from metric_sources)
+threshold_high = 70
+threshold_low = 30
+
+# Proportional scale-out: add enough instances to bring the fleet average down to
+# scale_up_target_cpu, at most max_scale_up_step per tick and max_instances in total
+scale_up_target_cpu = 60
+max_scale_up_step = 4
+max_instances = 10
+
+# Multi-step scale-in: below threshold_low, remove the least-loaded instances the rest can
+# absorb at scale_up_target_cpu, at most max_scale_down_step per tick
+max_scale_down_step = 4
+
+# Target tracking (--target-tracking): instead of acting only outside the threshold band, size the
+# fleet every tick to ceil(n * load / target_tracking_cpu), within min_instances..max_instances, in
+# one action. Scale-in is damped: it waits until the desired size is more than scale_in_tolerance
+# below the fleet and then removes scale_in_damping of the surplus. With target_tracking_ki > 0 a PI
+# controller smooths the desired size: the integral of the relative load error (load / target - 1)
+# per tick, clamped to +-target_tracking_integral_limit, is added with gain target_tracking_ki.
+target_tracking = False
+target_tracking_cpu = 50
+min_instances = 1
+scale_in_tolerance = 0.1
+scale_in_damping = 0.5
+target_tracking_kp = 1.0
+target_tracking_ki = 0.0
+target_tracking_integral_limit = 2.0
+target_tracking_state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'target_tracking.json')
+
+# Instance-type selection (see capacity.py): scale_up() launches the cheapest type or mix whose
+# sustained request rate covers the shortfall, sized in units of instance_type at scale_up_target_cpu.
+# Without the profile file (or without instance_type in it) every launch uses instance_type.
+capacity_profiles_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'capacity_profiles.json')
+candidate_instance_types = None  # restrict the choice, e.g. ['t3.micro', 't3.small']; None allows every profiled type
+burstable_credit_mode = 'standard'  # credit mode burstable instances run in: 'standard' or 'unlimited'
+surplus_credit_price = 0.05  # USD per vCPU-hour above baseline in unlimited mode
+
+# Scaling signals combined by the policy engine (see policies.py). A source's target is the
+# value that counts as scale_up_target_cpu-level load; sources without a target are already
+# percentages on the CPU scale. Memory (CloudWatch agent) only scales out: above 80% used it
+# adds capacity, below that it leaves the decision to the other sources.
+# RequestCountPerTarget: a '/' request burns 0.5 s of CPU, so 2 vCPUs at 60% serve 144 per minute.
+# Tail latency: '/' takes 0.5 s unqueued (the floor); ALB TargetResponseTime p95/p99 above
+# latency_objective_p95/p99 seconds means requests are queueing, which shows before the CPU average moves.
+# metric_sources of None evaluates these default sources (see get_metric_sources()).
+latency_floor = 0.5
+latency_objective_p95 = 0.8
+latency_objective_p99 = 1.5
+metric_sources = None
+policy_combine_rule = 'max'  # 'max' or 'weighted'
+
+# Predictive scaling (--predictive): scale on the fleet load forecast at now + provisioning lead time
+predictive_scaling = False
+history_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metric_history.json')
+history_max_samples = 120
+forecast_alpha = 0.5
+forecast_beta = 0.3
+default_provisioning_lead_time = 240  # seconds, until launches have been measured
+
+# Dashboard: hash of the last published body (to skip unchanged updates) and the fleet size
+# above which per-instance CPU widgets collapse into one SEARCH expression
+dashboard_hash_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.sha256')
+dashboard_max_instance_widgets = 8
+dashboard_name = 'AutoScalingMonitoring'
+cpu_search_expression = '{AWS/EC2,InstanceId} MetricName="CPUUtilization"'
+
+# Alerts: repeats of a subject within alert_window seconds are coalesced into one message;
+# state is persisted so cron runs rate-limit across ticks too
+alert_window = 900
+alert_drain_timeout = 10
+alert_state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alert_state.json')
+alert_subject_prefix = ''  # e.g. '[TG1] ' when several groups share the dispatcher (multi_group.py)
+# Cron runs wait (up to alert_drain_timeout) for queued alerts before exiting; long-running
+# processes (daemon mode, multi_group.py) leave them to the dispatcher thread
+drain_alerts_each_tick = True
+
+# Local time-series store (metric_store.py): recent datapoints, so each tick only fetches data newer
+# than what is stored, and recent scaling actions for cooldowns. None disables it.
+metric_store_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metric_store.sqlite')
+metric_store_retention = 3600  # seconds of datapoints and actions kept
+metric_refetch_overlap = 120  # seconds before the last fetch fetched again, for late CloudWatch datapoints
+
+# Cooldowns: no scale-out within scale_out_cooldown seconds of the last scale-out, and no scale-in
+# within scale_in_cooldown seconds of any scaling action (hysteresis against flapping)
+scale_out_cooldown = 120
+scale_in_cooldown = 600
+
+# Default seconds between ticks in daemon mode (matches the 3-minute cron schedule)
+default_tick_interval = 180
+
+# Tick profiling outputs (see tracing.py): JSON-lines trace per tick, optional Prometheus
+# textfile-collector file (e.g. /var/lib/node_exporter/textfile/autoscaler.prom), and --profile
+trace_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tick_trace.jsonl')
+prometheus_textfile = None
+profile_ticks = False
+
+# AWS service clients, created on first use by create_clients() unless set beforehand
+# (multi_group.py shares one set per region between groups)
+cloudwatch = None
+ec2 = None
+sns = None
+elbv2 = None
+_startup_timings = {}
+
+# Custom metrics buffered during a tick and sent in batches by flush_metrics()
+metrics_namespace = 'AutoScalingMonitoring'
+MAX_METRIC_DATUMS_PER_CALL = 1000
+_metric_buffer = {}
+
+# Per-tick inventory cache, see get_inventory()
+_inventory_cache = None
+
+# Capacity profiles, loaded once per process by get_capacity_profiles()
+_capacity_profiles = None
+
+# Time-series store, opened once per process by get_metric_store()
+_metric_store = None
+
+# Set by SIGTERM/SIGINT to stop daemon mode after the current tick
+shutdown_event = threading.Event()
 
 # --- Functions ---
 
+def create_clients():
+    """
+    Create the AWS clients for `region`. Credentials are resolved once up front so their
+    cost shows up in the first tick's profile; TCP keepalive lets daemon mode reuse pooled
+    connections across idle gaps between ticks.
+    """
+    global cloudwatch, ec2, sns, elbv2, _startup_timings
+    started = time.perf_counter()
+    session = boto3.session.Session(region_name=region)
+    session.get_credentials()
+    credentials_resolved = time.perf_counter()
+    client_config = Config(tcp_keepalive=True)
+    cloudwatch = session.client('cloudwatch', config=client_config)
+    ec2 = session.client('ec2', config=client_config)
+    sns = session.client('sns', config=client_config)
+    elbv2 = session.client('elbv2', config=client_config)
+    for client in (cloudwatch, ec2, sns, elbv2):
+        tracing.instrument_client(client)
+    _startup_timings = {
+        'credentials': credentials_resolved - started,
+        'clients': time.perf_counter() - credentials_resolved
+    }
+
+def get_user_data_script():
+    # user_data_script, or the bootstrap that installs app.py and serves it with app_server.
+    if user_data_script is not None:
+        return user_data_script
+    start_command = app_start_commands[app_server]
+    return '''#!/bin/bash
+cd /home/ubuntu
+apt update -y
+apt install -y python3-venv
+
+# Create the Python virtual environment
+python3 -m venv venv
+source venv/bin/activate
+
+# Install Flask and the WSGI server
+/home/ubuntu/venv/bin/pip install flask gunicorn
+
+# Create the Flask app and its server config
+cat > app.py <<'APP_EOF'
+''' + app_source + '''APP_EOF
+cat > gunicorn_conf.py <<'APP_EOF'
+''' + gunicorn_conf_source + '''APP_EOF
+
+# Update rc.local to start the Flask app on boot
+cat >> /etc/rc.local <<EOF
+#!/bin/bash
+# Run Flask app on startup using nohup
+nohup ''' + start_command + ''' > /home/ubuntu/flaskapp.log 2>&1 &
+exit 0
+EOF
+
+# Ensure rc.local is executable
+chmod +x /etc/rc.local
+
+# Start the Flask app right now
+nohup ''' + start_command + ''' > /home/ubuntu/flaskapp.log 2>&1 &
+
+'''
+
+def get_warm_pool_user_data_script():
+    # Pool instances stop themselves once bootstrapped; a bootstrapped image only needs to stop.
+    if ami_is_bootstrapped:
+        return warm_pool_bootstrapped_user_data_script
+    if warm_pool_user_data_script is not None:
+        return warm_pool_user_data_script
+    return get_user_data_script() + "shutdown -h now\n"
+
+def get_inventory_filters():
+    # inventory_filters, or every instance in security_group_id.
+    if inventory_filters is not None:
+        return inventory_filters
+    return [{'Name': 'instance.group-id', 'Values': [security_group_id]}]
+
+def get_metric_sources():
+    # metric_sources, or the default sources built from the current latency settings.
+    if metric_sources is not None:
+        return metric_sources
+    return [
+        policies.instance_source('cpu', 'AWS/EC2', 'CPUUtilization'),
+        policies.instance_source('memory', 'CWAgent', 'mem_used_percent', target=80, scale_in=False),
+        policies.alb_source('requests_per_target', 'RequestCountPerTarget', 'Sum', target=144),
+        policies.latency_source('latency_p95', 'p95', latency_objective_p95, latency_floor),
+        policies.latency_source('latency_p99', 'p99', latency_objective_p99, latency_floor),
+    ]
+
 def send_alert(subject, message):
-    # Send an SNS notification to the configured topic.
+    # Queue an SNS notification; alerts.py publishes it in the background, coalescing repeats.
+    alerts.send(alert_subject_prefix + subject, message)
+
+def publish_alert(subject, message):
+    # Send an SNS notification to the configured topic (called from the alert dispatcher thread).
     sns.publish(TopicArn=sns_topic_arn, Subject=subject, Message=message)
 
 def health_check_failure_alert(instance_id):
@@ -76,38 +355,54 @@ def wait_for_instance_ok(instance_id, timeout=300, interval=15):
     logger.warning(f"Timeout waiting for instance {instance_id} status OK.")
     return False
 
-def wait_for_target_healthy(target_group_arn, instance_id, timeout=300, interval=15):
-    # Wait for an instance to register as 'healthy' in the specified target group.
-    logger.info(f"Waiting for instance {instance_id} to become healthy in target group...")
-    elapsed = 0
-    while elapsed < timeout:
-        response = elbv2.describe_target_health(TargetGroupArn=target_group_arn)
-        for target_desc in response['TargetHealthDescriptions']:
-            target = target_desc['Target']
-            state = target_desc['TargetHealth']['State']
-            if target['Id'] == instance_id and state == 'healthy':
-                logger.info(f"Instance {instance_id} is healthy in target group.")
-                return True
-        time.sleep(interval)
-        elapsed += interval
-    logger.warning(f"Timeout waiting for instance {instance_id} to become healthy.")
-    return False
+def get_inventory():
+    """
+    Return {instance_id: {'state': state_name, 'tags': {key: value}, 'launch_time': epoch seconds,
+    'type': instance type}}
+    for every instance in this scaling group, in all states, from one paginated, server-side
+    filtered describe_instances pass. The result is cached until invalidate_inventory() is called,
+    which main() does at the start of every tick and the scaling actions do after mutating.
+    """
+    global _inventory_cache
+    if _inventory_cache is None:
+        inventory = {}
+        paginator = ec2.get_paginator('describe_instances')
+        for page in paginator.paginate(Filters=get_inventory_filters()):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    inventory[instance['InstanceId']] = {
+                        'state': instance['State']['Name'],
+                        'tags': {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])},
+                        'launch_time': instance['LaunchTime'].timestamp(),
+                        'type': instance['InstanceType']
+                    }
+        _inventory_cache = inventory
+    return _inventory_cache
+
+def invalidate_inventory():
+    # Drop the cached inventory so the next lookup re-describes the group.
+    global _inventory_cache
+    _inventory_cache = None
 
 def get_running_instances():
     #Retrieve all running instances and identify the primary (non-scalable) ones based on tags.
-    response = ec2.describe_instances(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}])
     all_running_instances = []
     primary_instances = []
 
-    for reservation in response['Reservations']:
-        for instance in reservation['Instances']:
-            instance_id = instance['InstanceId']
-            all_running_instances.append(instance_id)
-            tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
-            if tags.get(primary_tag_key) == primary_tag_value:
-                primary_instances.append(instance_id)
+    for instance_id, instance in get_inventory().items():
+        # Warm pool instances that are still bootstrapping are not serving capacity
+        if instance['state'] != 'running' or warm_pool_tag_key in instance['tags']:
+            continue
+        all_running_instances.append(instance_id)
+        if instance['tags'].get(primary_tag_key) == primary_tag_value:
+            primary_instances.append(instance_id)
     return all_running_instances, primary_instances
 
+def get_stopped_instances():
+    # Retrieve all stopped instances of the group that scale_up() can restart, warm pool members first.
+    stopped = [(i, instance) for i, instance in get_inventory().items() if instance['state'] == 'stopped']
+    return [i for i, instance in sorted(stopped, key=lambda item: warm_pool_tag_key not in item[1]['tags'])]
+
 def get_cpu_utilization(instance_id, start_time, end_time):
     """
     Retrieve average CPU utilization for a given instance over a time period.
@@ -132,155 +427,694 @@ def get_cpu_utilization(instance_id, start_time, end_time):
         logger.info(f"No CPU data for instance {instance_id}. Assuming 0%.")
         return 0.0
 
-def publish_running_instances_metric(count):
-    #Publish the count of currently running instances to a custom CloudWatch metric.
-    cloudwatch.put_metric_data(
-        Namespace='AutoScalingMonitoring',
-        MetricData=[{
-            'MetricName': 'RunningInstances',
-            'Timestamp': datetime.now(timezone.utc),
-            'Value': count,
-            'Unit': 'Count'
-        }]
-    )
-    logger.info(f"Published running instances count: {count}")
+# GetMetricData accepts at most 500 metric queries per request
+METRIC_DATA_MAX_QUERIES = 500
 
-def scale_up(cpu_average):
+def get_fleet_metrics(instance_ids, start_time, end_time, metrics=(('AWS/EC2', 'CPUUtilization'),), extra_queries=(), store=None):
     """
-    Scale up by starting a stopped instance if available, otherwise launch a new instance.
-    Registers the instance to the target group and waits for health checks.
+    Retrieve the average of each (namespace, metric name) pair for every instance
+    using batched GetMetricData calls instead of one GetMetricStatistics call per instance.
+    `extra_queries` are complete MetricDataQuery dicts (e.g. ALB metrics) fetched in the same calls.
+    Queries are chunked to the per-call limit and NextToken pages are followed.
+    With a `store` (metric_store.py) only data newer than what is already stored is fetched,
+    less metric_refetch_overlap for late datapoints, and averages are taken from the store.
+    Returns ({metric_name: {instance_id: average}, query_id: average}, {(metric_name, instance_id): latest timestamp});
+    instances without datapoints average 0.0 and have no timestamp entry.
     """
-    logger.info("SCALE UP triggered. Checking for stopped instances.")
+    queries = []
+    query_keys = {}
+    query_series = {}
+    for m_index, (namespace, metric_name) in enumerate(metrics):
+        for i_index, instance_id in enumerate(instance_ids):
+            query_id = f"m{m_index}_{i_index}"
+            query_keys[query_id] = (metric_name, instance_id)
+            query_series[query_id] = f"{namespace}/{metric_name}/{instance_id}"
+            queries.append({
+                'Id': query_id,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': namespace,
+                        'MetricName': metric_name,
+                        'Dimensions': [{'Name': 'InstanceId', 'Value': instance_id}]
+                    },
+                    'Period': 60,
+                    'Stat': 'Average'
+                },
+                'ReturnData': True
+            })
 
-    # Check for any stopped instances that can be restarted
-    stopped_response = ec2.describe_instances(Filters=[{'Name': 'instance-state-name', 'Values': ['stopped']}])
-    stopped_instances = [i['InstanceId'] for r in stopped_response['Reservations'] for i in r['Instances']]
+    for query in extra_queries:
+        query_keys[query['Id']] = (query['Id'], None)
+        stat = query['MetricStat']
+        query_series[query['Id']] = f"{stat['Metric']['Namespace']}/{stat['Metric']['MetricName']}:{stat['Stat']}/{query['Id']}"
+        queries.append(query)
 
-    # User data to bootstrap new instance with Flask app for load simulation
-    user_data_script = '''#!/bin/bash
-cd /home/ubuntu
-apt update -y
-apt install -y python3-venv
+    fetch_start = start_time
+    if store is not None:
+        # One StartTime covers the whole batch: the oldest point any series still needs
+        known = metric_store.fetched_until(store, query_series.values())
+        window_start = start_time.timestamp()
+        needed = [max(known.get(series, window_start) - metric_refetch_overlap, window_start)
+                  for series in query_series.values()]
+        fetch_start = datetime.fromtimestamp(min(needed, default=window_start), timezone.utc)
 
-# Create the Python virtual environment
-python3 -m venv venv
-source venv/bin/activate
+    # Collect every page's values per query before averaging
+    values = {query_id: [] for query_id in query_keys}
+    latest = {}
+    fetched = {query_id: [] for query_id in query_keys}
+    for offset in range(0, len(queries), METRIC_DATA_MAX_QUERIES):
+        kwargs = {
+            'MetricDataQueries': queries[offset:offset + METRIC_DATA_MAX_QUERIES],
+            'StartTime': fetch_start,
+            'EndTime': end_time
+        }
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            for result in response['MetricDataResults']:
+                query_id = result['Id']
+                values[query_id].extend(result['Values'])
+                if store is not None:
+                    fetched[query_id].extend(zip((ts.timestamp() for ts in result['Timestamps']), result['Values']))
+                if result['Timestamps']:
+                    newest = max(result['Timestamps'])
+                    if query_id not in latest or newest > latest[query_id]:
+                        latest[query_id] = newest
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+            kwargs['NextToken'] = next_token
 
-# Install Flask
-/home/ubuntu/venv/bin/pip install flask
+    if store is not None:
+        metric_store.add_points(store, {query_series[q]: rows for q, rows in fetched.items() if rows},
+                                query_series.values(), end_time.timestamp())
+        stored = metric_store.window(store, query_series.values(), start_time.timestamp(), end_time.timestamp())
+        latest = {}
+        for query_id, series in query_series.items():
+            values[query_id] = [value for _, value in stored[series]]
+            if stored[series]:
+                latest[query_id] = datetime.fromtimestamp(stored[series][-1][0], timezone.utc)
 
-# Create the Flask app
-cat > app.py <<EOF
-from flask import Flask
-import time
-app = Flask(__name__)
+    results = {metric_name: {} for _, metric_name in metrics}
+    for query_id, (metric_name, instance_id) in query_keys.items():
+        points = values[query_id]
+        average = sum(points) / len(points) if points else 0.0
+        if instance_id is None:
+            results[query_id] = average
+        else:
+            results[metric_name][instance_id] = average
+    return results, {query_keys[q]: ts for q, ts in latest.items()}
 
-@app.route("/health")
-def health_check():
-    return "OK", 200
+def get_fleet_cpu_utilization(instance_ids, start_time, end_time, metrics=(('AWS/EC2', 'CPUUtilization'),), extra_queries=(), store=None):
+    """
+    Retrieve average CPU utilization for every instance, plus any other per-instance `metrics`
+    (which must include CPUUtilization) and `extra_queries`, in a single batched fetch.
+    Logs the same per-instance lines as get_cpu_utilization() and returns
+    ({instance_id: avg_cpu}, all results as returned by get_fleet_metrics()).
+    """
+    results, latest = get_fleet_metrics(instance_ids, start_time, end_time, metrics, extra_queries, store)
+    cpu_per_instance = results['CPUUtilization']
+    for instance_id in instance_ids:
+        timestamp = latest.get(('CPUUtilization', instance_id))
+        if timestamp is not None:
+            timestamp_uk = timestamp.astimezone(uk_tz)
+            logger.info(f"Instance {instance_id} - Timestamp (UK): {timestamp_uk.strftime('%Y-%m-%d %H:%M:%S')}, Avg CPU: {cpu_per_instance[instance_id]:.2f}%")
+        else:
+            logger.info(f"No CPU data for instance {instance_id}. Assuming 0%.")
+    return cpu_per_instance, results
 
-@app.route("/")
-def cpu_burner():
-    start = time.time()
-    while time.time() - start < 0.5:
-        pass
-    return "CPU-intensive response"
+def policy_metric_queries():
+    # Per-instance (namespace, metric) pairs and ALB queries needed by the metric sources, CPU first.
+    metrics = [('AWS/EC2', 'CPUUtilization')]
+    extra_queries = []
+    for source in get_metric_sources():
+        if source['scope'] == policies.INSTANCE_SCOPE:
+            if (source['namespace'], source['metric']) not in metrics:
+                metrics.append((source['namespace'], source['metric']))
+        else:
+            extra_queries.append(alb_metric_query(source['name'], source['metric'], source['stat']))
+    return metrics, extra_queries
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=80)
-EOF
+def policy_load(results, instance_ids):
+    """
+    Evaluate the metric sources over `instance_ids` and combine them with policy_combine_rule.
+    Returns (combined load, {source name: load}), loads being CPU-equivalent percentages.
+    """
+    sources = get_metric_sources()
+    values = {}
+    for source in sources:
+        if source['scope'] == policies.INSTANCE_SCOPE:
+            per_instance = results[source['metric']]
+            values[source['name']] = sum(per_instance[i] for i in instance_ids) / len(instance_ids) if instance_ids else 0.0
+        else:
+            values[source['name']] = results[source['name']]
+    loads = policies.source_loads(sources, values, scale_up_target_cpu)
+    return policies.combine_loads(sources, loads, policy_combine_rule, scale_up_target_cpu), loads
 
-# Update rc.local to start the Flask app on boot
-cat >> /etc/rc.local <<EOF
-#!/bin/bash
-# Run Flask app on startup using nohup
-nohup /home/ubuntu/venv/bin/python /home/ubuntu/app.py > /home/ubuntu/flaskapp.log 2>&1 &
-exit 0
-EOF
+def alb_metric_query(query_id, metric_name, stat):
+    # MetricDataQuery for an ALB metric of this group's target group and load balancer.
+    return {
+        'Id': query_id,
+        'MetricStat': {
+            'Metric': {
+                'Namespace': 'AWS/ApplicationELB',
+                'MetricName': metric_name,
+                'Dimensions': [
+                    {'Name': 'TargetGroup', 'Value': target_group_arn.split(":")[-1]},
+                    {'Name': 'LoadBalancer', 'Value': load_balancer_name}
+                ]
+            },
+            'Period': 60,
+            'Stat': stat
+        },
+        'ReturnData': True
+    }
 
-# Ensure rc.local is executable
-chmod +x /etc/rc.local
+def get_metric_store():
+    # The local time-series store, opened on first use and trimmed to metric_store_retention; None if disabled.
+    global _metric_store
+    if metric_store_file is None:
+        return None
+    if _metric_store is None:
+        _metric_store = metric_store.open_store(metric_store_file)
+    metric_store.trim(_metric_store, time.time() - metric_store_retention)
+    return _metric_store
 
-# Start the Flask app right now
-nohup /home/ubuntu/venv/bin/python /home/ubuntu/app.py > /home/ubuntu/flaskapp.log 2>&1 &
+def cooldown_remaining(store, action, now):
+    # Seconds until `action` ('scale_up' or 'scale_down') is allowed by the cooldowns; 0 when allowed.
+    if store is None:
+        return 0
+    if action == 'scale_up':
+        last, cooldown = metric_store.last_action(store, ['scale_up']), scale_out_cooldown
+    else:
+        last, cooldown = metric_store.last_action(store), scale_in_cooldown
+    return 0 if last is None else max(0, last + cooldown - now)
 
-'''
+def load_json_state(path):
+    # Load controller state persisted by earlier ticks; a missing or unreadable file means empty state.
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read controller state from {path}: {e}")
+        return {}
 
-    if stopped_instances:
-        # Start the first stopped instance found
-        to_start = stopped_instances[0]
-        logger.info(f"Starting stopped instance: {to_start}")
-        ec2.start_instances(InstanceIds=[to_start])
-
-        logger.info(f"Waiting for 45 seconds for instance {to_start} to initialize...")
-        time.sleep(45)
-
-        # Register the instance with the target group
-        elbv2.register_targets(TargetGroupArn=target_group_arn, Targets=[{'Id': to_start, 'Port': 80}])
-        logger.info(f"Registered {to_start} with target group.")
-
-        if wait_for_target_healthy(target_group_arn, to_start):
-            logger.info(f"Instance {to_start} is healthy and ready.")
-            # Publish running instances metric immediately after scale-up
-            all_running_instances, _ = get_running_instances()
-            publish_running_instances_metric(len(all_running_instances))
-            send_alert("SCALE UP Triggered", f"High CPU ({cpu_average:.2f}%).")
-            return to_start
-        else:
-            logger.warning(f"Instance {to_start} failed to become healthy in target group.")
-            return None
-    else:
-        # Launch a brand-new instance if none are stopped
-        logger.info("No stopped instances found. Launching new instance.")
-        response = ec2.run_instances(
-            ImageId=ami_id,
-            InstanceType=instance_type,
-            KeyName=key_name,
-            MaxCount=1,
-            MinCount=1,
-            SecurityGroupIds=[security_group_id],
-            TagSpecifications=[{
-                'ResourceType': 'instance',
-                'Tags': [{'Key': 'Purpose', 'Value': 'ScaledInstance'}]
-            }],
-            UserData=user_data_script
+def save_json_state(path, state):
+    # Persist controller state atomically so a crash mid-write cannot corrupt the state file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def record_pending_launch(pending_launches, instance_id, source, cpu_average):
+    # Track a freshly started or launched instance in the 'requested' state.
+    now = time.time()
+    pending_launches[instance_id] = {
+        'state': LAUNCH_REQUESTED,
+        'source': source,
+        'cpu_average': cpu_average,
+        'requested_at': now,
+        'updated_at': now
+    }
+    logger.info(f"Instance {instance_id} pending: {LAUNCH_REQUESTED}")
+
+def set_launch_state(pending_launches, instance_id, state):
+    pending_launches[instance_id]['state'] = state
+    pending_launches[instance_id]['updated_at'] = time.time()
+    logger.info(f"Instance {instance_id} pending: {state}")
+
+def record_provision_latency(instance_id, source, seconds):
+    # Append one provision-to-healthy measurement; `source` is 'pool', 'start' or 'launch'.
+    with open(provision_log_file, 'a') as f:
+        f.write(json.dumps({
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'instance_id': instance_id,
+            'source': source,
+            'seconds': round(seconds, 1)
+        }) + "\n")
+
+def advance_pending_launches(pending_launches):
+    """
+    Move every pending launch one step along requested -> running -> registered -> healthy/failed.
+    Reads instance states from the cached inventory, then makes one register_targets call for
+    all newly running instances and one describe_target_health call for all registered ones.
+    Healthy and failed entries are reported and removed.
+    Returns {instance_id: seconds from request to healthy} for the instances that became healthy.
+    """
+    if not pending_launches:
+        return {}
+    now = time.time()
+
+    requested = [i for i, p in pending_launches.items() if p['state'] == LAUNCH_REQUESTED]
+    if requested:
+        inventory = get_inventory()
+        for instance_id in requested:
+            state = inventory.get(instance_id, {}).get('state')
+            if state == 'running':
+                set_launch_state(pending_launches, instance_id, LAUNCH_RUNNING)
+            elif state in ('shutting-down', 'terminated'):
+                logger.warning(f"Instance {instance_id} entered state '{state}' while launching.")
+                set_launch_state(pending_launches, instance_id, LAUNCH_FAILED)
+
+    running = [i for i, p in pending_launches.items() if p['state'] == LAUNCH_RUNNING]
+    if running:
+        elbv2.register_targets(TargetGroupArn=target_group_arn, Targets=[{'Id': i, 'Port': 80} for i in running])
+        logger.info(f"Registered {running} with target group.")
+        for instance_id in running:
+            set_launch_state(pending_launches, instance_id, LAUNCH_REGISTERED)
+
+    registered = [i for i, p in pending_launches.items() if p['state'] == LAUNCH_REGISTERED]
+    if registered:
+        response = elbv2.describe_target_health(
+            TargetGroupArn=target_group_arn,
+            Targets=[{'Id': i, 'Port': 80} for i in registered]
         )
-        new_instance_id = response['Instances'][0]['InstanceId']
-        logger.info(f"Launched new instance: {new_instance_id}")
-
-        logger.info(f"Waiting for 45 seconds for instance {new_instance_id} to initialize...")
-        time.sleep(45)
-
-        # Register new instance in the target group
-        elbv2.register_targets(TargetGroupArn=target_group_arn, Targets=[{'Id': new_instance_id, 'Port': 80}])
-        logger.info(f"Registered {new_instance_id} with target group.")
-
-        if wait_for_target_healthy(target_group_arn, new_instance_id):
-            logger.info(f"Instance {new_instance_id} is healthy and ready.")
-            all_running_instances, _ = get_running_instances()
-            publish_running_instances_metric(len(all_running_instances))
-            send_alert("SCALE UP Triggered", f"High CPU ({cpu_average:.2f}%).")
-            return new_instance_id
-        else:
-            logger.warning(f"Instance {new_instance_id} failed to become healthy in target group.")
-            health_check_failure_alert(new_instance_id)
-            return None
-
-def scale_down(cpu_average, all_running_instances, primary_instances):
-    # Scale down by stopping the most recently added non-primary instance.
-    candidates_to_stop = [i for i in all_running_instances if i not in primary_instances]
-    if candidates_to_stop:
-        instance_to_stop = candidates_to_stop[-1]
-        logger.info(f"SCALE DOWN: Stopping {instance_to_stop}")
-        elbv2.deregister_targets(TargetGroupArn=target_group_arn, Targets=[{'Id': instance_to_stop, 'Port': 80}])
-        ec2.stop_instances(InstanceIds=[instance_to_stop])
-        # Publish running instances metric immediately after scale-down
+        healthy = {
+            target['Target']['Id']
+            for target in response['TargetHealthDescriptions']
+            if target['TargetHealth']['State'] == 'healthy'
+        }
+        for instance_id in registered:
+            if instance_id in healthy:
+                set_launch_state(pending_launches, instance_id, LAUNCH_HEALTHY)
+
+    # Anything not healthy within the timeout is given up on
+    for instance_id, pending in pending_launches.items():
+        if pending['state'] not in (LAUNCH_HEALTHY, LAUNCH_FAILED) and now - pending['requested_at'] > launch_timeout:
+            logger.warning(f"Timeout waiting for instance {instance_id} to become healthy (state: {pending['state']}).")
+            set_launch_state(pending_launches, instance_id, LAUNCH_FAILED)
+
+    became_healthy = {}
+    for instance_id, pending in list(pending_launches.items()):
+        if pending['state'] == LAUNCH_HEALTHY:
+            became_healthy[instance_id] = pending['updated_at'] - pending['requested_at']
+            logger.info(f"Instance {instance_id} is healthy and ready after {became_healthy[instance_id]:.0f}s ({pending['source']}).")
+            record_provision_latency(instance_id, pending['source'], became_healthy[instance_id])
+            emit_metric('TimeToHealthy', became_healthy[instance_id], 'Seconds')
+            send_alert("SCALE UP Triggered", f"High CPU ({pending['cpu_average']:.2f}%).")
+            del pending_launches[instance_id]
+        elif pending['state'] == LAUNCH_FAILED:
+            health_check_failure_alert(instance_id)
+            del pending_launches[instance_id]
+
+    if became_healthy:
+        # Publish running instances metric as soon as new capacity is serving
         all_running_instances, _ = get_running_instances()
         publish_running_instances_metric(len(all_running_instances))
-        send_alert("SCALE DOWN Triggered", f"Low CPU ({cpu_average:.2f}%). Stopped {instance_to_stop}.")
+    return became_healthy
+
+def forecast_load(history, now, serving_cpu_total, request_rate):
+    """
+    Record this tick's fleet load in the rolling `history`, score forecasts that have come due,
+    and return the serving CPU total (instance-percent) forecast at now + provisioning lead time.
+    The CPU forecast is cross-checked with a request-rate forecast scaled by the current CPU
+    cost per request; the larger of the two is used.
+    """
+    samples = history.setdefault('samples', [])
+    samples.append([now, serving_cpu_total, request_rate])
+    del samples[:-history_max_samples]
+    lead_time = history.get('lead_time', default_provisioning_lead_time)
+
+    # Compare forecasts made one lead time ago with what actually arrived
+    due = [f for f in history.get('forecasts', []) if f[0] <= now]
+    history['forecasts'] = [f for f in history.get('forecasts', []) if f[0] > now]
+    forecast_error = None
+    if due:
+        predicted = due[-1][1]
+        forecast_error = abs(predicted - serving_cpu_total) / max(serving_cpu_total, 1.0) * 100
+
+    timestamps = [sample[0] for sample in samples]
+    predicted_cpu, _ = forecast.holt_forecast(timestamps, [sample[1] for sample in samples],
+                                              lead_time, forecast_alpha, forecast_beta)
+    if request_rate:
+        predicted_requests, _ = forecast.holt_forecast(timestamps, [sample[2] or 0.0 for sample in samples],
+                                                       lead_time, forecast_alpha, forecast_beta)
+        predicted_cpu = max(predicted_cpu, serving_cpu_total * predicted_requests / request_rate)
+    history['forecasts'].append([now + lead_time, predicted_cpu])
+
+    logger.info(f"Forecast serving CPU in {lead_time:.0f}s: {predicted_cpu:.2f} (now {serving_cpu_total:.2f})")
+    publish_forecast_metrics(forecast_error, lead_time)
+    return predicted_cpu
+
+def publish_forecast_metrics(forecast_error, lead_time):
+    # Publish forecast accuracy and the provisioning lead time the forecast is made for.
+    emit_metric('ProvisioningLeadTime', lead_time, 'Seconds')
+    if forecast_error is not None:
+        emit_metric('ForecastError', forecast_error, 'Percent')
+
+def publish_running_instances_metric(count):
+    #Publish the count of currently running instances to a custom CloudWatch metric.
+    emit_metric('RunningInstances', count)
+    logger.info(f"Published running instances count: {count}")
+
+def emit_metric(name, value, unit='Count'):
+    # Buffer one datapoint for the next flush_metrics(); nothing is sent to CloudWatch here.
+    _metric_buffer.setdefault((name, unit), []).append(value)
+
+def flush_metrics():
+    """
+    Send every buffered datapoint to the metrics_namespace namespace in as few put_metric_data
+    calls as the API allows. A metric with several datapoints since the last flush is sent as one
+    statistic set (sample count, sum, min, max) instead of separate datums.
+    """
+    if not _metric_buffer:
+        return
+    timestamp = datetime.now(timezone.utc)
+    metric_data = []
+    for (name, unit), values in _metric_buffer.items():
+        datum = {'MetricName': name, 'Timestamp': timestamp, 'Unit': unit}
+        if len(values) == 1:
+            datum['Value'] = values[0]
+        else:
+            datum['StatisticValues'] = {
+                'SampleCount': len(values),
+                'Sum': sum(values),
+                'Minimum': min(values),
+                'Maximum': max(values)
+            }
+        metric_data.append(datum)
+    _metric_buffer.clear()
+
+    for offset in range(0, len(metric_data), MAX_METRIC_DATUMS_PER_CALL):
+        cloudwatch.put_metric_data(Namespace=metrics_namespace, MetricData=metric_data[offset:offset + MAX_METRIC_DATUMS_PER_CALL])
+    logger.info(f"Flushed {len(metric_data)} metrics to {metrics_namespace}.")
+
+def scaling_decision(avg_cpu, serving_cpu_total, serving_count, pending_count, fleet_size, removable_count,
+                     high=None, low=None, target_cpu=None, max_step=None, max_fleet=None, max_down_step=None,
+                     serving_units=None, pending_units=None):
+    """
+    Change in instance count for one tick: positive to scale out, negative to scale in, 0 to hold.
+    Scale-out adds enough instances that the load of the serving instances, spread over the
+    serving, pending and new capacity, averages at most `target_cpu`, capped by `max_step`
+    and by the room left under `max_fleet`. Scale-in removes the instances the remaining
+    serving ones can absorb while averaging at most `target_cpu`, capped by `max_down_step`
+    and by the number of removable instances. Policy arguments default to the module settings.
+    Scale-out is counted in the capacity units scale_up() plans in when `serving_units` and
+    `pending_units` (see capacity_units()) are given, in instances otherwise.
+    Works elementwise on NumPy arrays so simulator.py can evaluate many policies at once.
+    """
+    high = threshold_high if high is None else high
+    low = threshold_low if low is None else low
+    target_cpu = scale_up_target_cpu if target_cpu is None else target_cpu
+    max_step = max_scale_up_step if max_step is None else max_step
+    max_fleet = max_instances if max_fleet is None else max_fleet
+    max_down_step = max_scale_down_step if max_down_step is None else max_down_step
+
+    serving_units = serving_count if serving_units is None else serving_units
+    pending_units = pending_count if pending_units is None else pending_units
+
+    desired = np.ceil(np.asarray(serving_cpu_total, dtype=float) / target_cpu)
+    # The serving load spread over the serving capacity; rounding absorbs float error in the units
+    unit_load = np.asarray(serving_cpu_total, dtype=float) * serving_units / np.maximum(serving_count, 1)
+    shortfall = np.ceil(np.round(unit_load / target_cpu - serving_units - pending_units, 9))
+    needed = np.minimum(np.minimum(shortfall, max_step), max_fleet - fleet_size)
+    add = np.where(np.asarray(serving_count) > 0, np.maximum(needed, 0), 0)
+    surplus = np.minimum(np.minimum(serving_count - np.maximum(desired, 1), removable_count), max_down_step)
+    remove = -np.maximum(surplus, 0)
+    change = np.where(avg_cpu > high, add, np.where(avg_cpu < low, remove, 0)).astype(int)
+    return int(change) if change.ndim == 0 else change
+
+def target_tracking_decision(serving_cpu_total, serving_count, pending_count, fleet_size, removable_count, integral=0.0,
+                             target_cpu=None, min_fleet=None, max_fleet=None, tolerance=None, damping=None, kp=None, ki=None,
+                             serving_units=None, pending_units=None):
+    """
+    Target-tracking change in instance count for one tick, and the updated PI integral.
+    The desired fleet is ceil(serving_count * (1 + kp * e + ki * integral)), where
+    e = load / target_cpu - 1 is the relative error of the serving instances' average load;
+    with kp=1 and ki=0 that is ceil(serving_cpu_total / target_cpu). Scale-out adds the
+    difference to the serving and pending capacity in one step, up to `max_fleet`. Scale-in
+    only happens with nothing pending and the desired size more than `tolerance` below the
+    serving count; it then removes `damping` of the surplus (at least one instance), down to
+    `min_fleet` and at most the removable instances. The integral stops accumulating while
+    the fleet is pinned at `min_fleet` or `max_fleet`. Like scaling_decision(), scale-out is
+    counted in capacity units when `serving_units` and `pending_units` are given. Policy
+    arguments default to the module settings; works elementwise on NumPy arrays.
+    """
+    target_cpu = target_tracking_cpu if target_cpu is None else target_cpu
+    min_fleet = min_instances if min_fleet is None else min_fleet
+    max_fleet = max_instances if max_fleet is None else max_fleet
+    tolerance = scale_in_tolerance if tolerance is None else tolerance
+    damping = scale_in_damping if damping is None else damping
+    kp = target_tracking_kp if kp is None else kp
+    ki = target_tracking_ki if ki is None else ki
+
+    serving_count = np.asarray(serving_count)
+    serving_units = serving_count if serving_units is None else serving_units
+    pending_units = pending_count if pending_units is None else pending_units
+    average = np.asarray(serving_cpu_total, dtype=float) / np.maximum(serving_count, 1)
+    error = average / target_cpu - 1
+    # Conditional integration (anti-windup): hold the integral while the fleet cannot move further
+    pinned = ((error > 0) & (fleet_size >= max_fleet)) | ((error < 0) & (fleet_size <= min_fleet))
+    integral = np.where(ki == 0, 0.0, np.where(pinned, integral, np.clip(
+        integral + error, -target_tracking_integral_limit, target_tracking_integral_limit)))
+
+    # Tiny tolerance so a fleet exactly at the target is not rounded up by float error
+    factor = 1 + kp * error + ki * integral
+    desired = np.clip(np.ceil(serving_count * factor - 1e-9), min_fleet, max_fleet)
+    shortfall = np.maximum(np.ceil(np.round(serving_units * factor - serving_units - pending_units, 9)),
+                           min_fleet - serving_count - pending_count)
+    add = np.maximum(np.minimum(shortfall, max_fleet - fleet_size), 0)
+    surplus = serving_count - desired
+    remove = np.minimum(np.minimum(np.ceil(surplus * damping), removable_count), serving_count - min_fleet)
+    remove = np.where((pending_count == 0) & (surplus > tolerance * serving_count), np.maximum(remove, 0), 0)
+    change = np.where(serving_count > 0, np.where(add > 0, add, -remove), 0).astype(int)
+    if change.ndim == 0:
+        return int(change), float(integral)
+    return change, integral
+
+def get_capacity_profiles():
+    # Capacity profiles usable for launches (candidate_instance_types only), or None to launch instance_type.
+    global _capacity_profiles
+    if _capacity_profiles is None:
+        try:
+            profiles = capacity.load_profiles(capacity_profiles_file)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"No capacity profiles ({e}); launching {instance_type} only.")
+            profiles = {}
+        _capacity_profiles = profiles
+    if instance_type not in _capacity_profiles:
+        return None
+    return {t: p for t, p in _capacity_profiles.items() if candidate_instance_types is None or t in candidate_instance_types}
+
+def capacity_units(instance_ids):
+    """
+    Capacity of `instance_ids` in the units scale-out is sized in: one unit is the request
+    rate of one instance_type instance at scale_up_target_cpu (its rps_at_target), the same
+    measure as the CPU-derived shortfall. Without capacity profiles (or for types missing
+    from them) every instance counts as one unit.
+    """
+    if get_capacity_profiles() is None:
+        return float(len(instance_ids))
+    unit_rps = _capacity_profiles[instance_type]['rps_at_target']
+    inventory = get_inventory()
+    units = 0.0
+    for instance_id in instance_ids:
+        profile = _capacity_profiles.get(inventory.get(instance_id, {}).get('type'))
+        units += profile['rps_at_target'] / unit_rps if profile else 1.0
+    return units
+
+def scale_up(cpu_average, pending_launches, count=1, max_count=None):
+    """
+    Scale up by `count` units of capacity (see capacity_units()), adding at most `max_count`
+    instances (default `count`).
+    Stopped instances are started first, with one start_instances call; the remaining
+    shortfall is launched as the cheapest instance type or mix from the capacity profiles,
+    one run_instances call per type.
+    Returns immediately after the API calls with the new instance IDs; each instance is
+    tracked in `pending_launches` and registered/health-checked by advance_pending_launches()
+    on later ticks.
+    """
+    logger.info(f"SCALE UP triggered for {count} instance(s) of {instance_type} capacity. Checking for stopped instances.")
+    max_count = count if max_count is None else max_count
+    profiles = get_capacity_profiles()
+
+    # Check for any stopped instances that can be restarted
+    stopped_instances = get_stopped_instances()
+    new_instance_ids = []
+
+    # Restart stopped instances first (warm pool members before scaled-in ones), all in one call,
+    # until their capacity covers the shortfall
+    inventory = get_inventory()
+    if profiles is None:
+        to_start = [i for i in stopped_instances if i not in pending_launches][:min(count, max_count)]
+        remaining = min(count, max_count) - len(to_start)
+    else:
+        # instance_type sets the unit even when it is not a launch candidate
+        unit_rps = _capacity_profiles[instance_type]['rps_at_target']
+        remaining = count * unit_rps
+        to_start = []
+        for instance_id in stopped_instances:
+            if remaining <= 0 or len(to_start) >= max_count:
+                break
+            if instance_id in pending_launches:
+                continue
+            to_start.append(instance_id)
+            remaining -= capacity_units([instance_id]) * unit_rps
+    if to_start:
+        logger.info(f"Starting stopped instances: {to_start}")
+        ec2.start_instances(InstanceIds=to_start)
+        # Pool members join the fleet: drop the pool tag so they count as running capacity
+        pool_hits = [i for i in to_start if warm_pool_tag_key in inventory[i]['tags']]
+        if pool_hits:
+            ec2.delete_tags(Resources=pool_hits, Tags=[{'Key': warm_pool_tag_key}])
+            logger.info(f"Warm pool hits: {pool_hits}")
+        invalidate_inventory()
+        for instance_id in to_start:
+            record_pending_launch(pending_launches, instance_id, 'pool' if instance_id in pool_hits else 'start', cpu_average)
+        new_instance_ids.extend(to_start)
+
+    # Launch brand-new instances for whatever stopped ones could not cover. The mix covers the
+    # remaining at-target rate at each type's sustained rate, which is never above its at-target
+    # rate, so it adds at least the requested units.
+    if profiles is None:
+        mix = {instance_type: remaining} if remaining > 0 else {}
     else:
-        logger.info("No non-primary instances to stop. Skipping.")
-        send_alert("SCALE DOWN Skipped", "Only primary instances are running.")
+        mix = capacity.cheapest_mix(remaining, profiles, max_count - len(to_start), scale_up_target_cpu,
+                                    burstable_credit_mode, surplus_credit_price)
+    for launch_type, launch_count in sorted(mix.items()):
+        logger.info(f"Launching {launch_count} new {launch_type} instance(s).")
+        # A bootstrapped image needs no user data
+        launched = launch_instances(launch_count, [{'Key': 'Purpose', 'Value': 'ScaledInstance'}],
+                                    None if ami_is_bootstrapped else get_user_data_script(), launch_type)
+        logger.info(f"Launched new instances: {launched}")
+        for instance_id in launched:
+            record_pending_launch(pending_launches, instance_id, 'launch', cpu_average)
+        new_instance_ids.extend(launched)
+
+    return new_instance_ids
+
+def launch_instances(count, tags, user_data, launch_type=None):
+    """
+    Launch up to `count` instances of this group (of `launch_type`, default instance_type)
+    with one run_instances call and return their IDs. `user_data` of None launches without any.
+    """
+    params = dict(
+        ImageId=ami_id,
+        InstanceType=launch_type or instance_type,
+        KeyName=key_name,
+        MaxCount=count,
+        MinCount=1,
+        SecurityGroupIds=[security_group_id],
+        TagSpecifications=[{
+            'ResourceType': 'instance',
+            'Tags': tags + [{'Key': group_tag_key, 'Value': group_tag_value}]
+        }]
+    )
+    if subnet_id:
+        params['SubnetId'] = subnet_id
+    if user_data is not None:
+        params['UserData'] = user_data
+    response = ec2.run_instances(**params)
+    invalidate_inventory()
+    return [instance['InstanceId'] for instance in response['Instances']]
+
+def maintain_warm_pool():
+    """
+    Keep warm_pool_size bootstrapped, stopped instances ready for scale_up().
+    Pool instances boot with user data that stops the instance once bootstrapping finishes,
+    so a tagged instance that is running is still warming and a stopped one is ready.
+    Every stopped instance of the group is ready capacity; only the shortfall is launched,
+    in one call, and instances stuck warming past warm_pool_bootstrap_timeout are terminated.
+    """
+    inventory = get_inventory()
+    now = time.time()
+    ready = [i for i, instance in inventory.items() if instance['state'] == 'stopped']
+    warming = [i for i, instance in inventory.items()
+               if warm_pool_tag_key in instance['tags'] and instance['state'] in ('pending', 'running', 'stopping')]
+
+    stuck = [i for i in warming if now - inventory[i]['launch_time'] > warm_pool_bootstrap_timeout]
+    if stuck:
+        logger.warning(f"Warm pool instances did not finish bootstrapping, terminating: {stuck}")
+        ec2.terminate_instances(InstanceIds=stuck)
+        invalidate_inventory()
+        warming = [i for i in warming if i not in stuck]
+
+    shortfall = warm_pool_size - len(ready) - len(warming)
+    if shortfall > 0:
+        launched = launch_instances(shortfall, [{'Key': 'Purpose', 'Value': 'WarmPool'},
+                                                {'Key': warm_pool_tag_key, 'Value': 'true'}],
+                                    # Pool instances always get user data: it is what stops them once warm
+                                    get_warm_pool_user_data_script())
+        logger.info(f"Refilling warm pool ({len(ready)} ready, {len(warming)} warming): launched {launched}")
+
+def bake_ami(instance_id):
+    """
+    Create an AMI from a bootstrapped instance so launches no longer run the bootstrap script.
+    Returns the image ID; set ami_id to it and ami_is_bootstrapped = True once it is available.
+    """
+    name = f"scaler-bootstrapped-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+    response = ec2.create_image(
+        InstanceId=instance_id,
+        Name=name,
+        Description=f"Bootstrapped Flask app image baked from {instance_id}",
+        TagSpecifications=[{'ResourceType': 'image', 'Tags': [{'Key': group_tag_key, 'Value': group_tag_value}]}]
+    )
+    logger.info(f"Baking AMI {response['ImageId']} ({name}) from {instance_id}.")
+    return response['ImageId']
+
+def scale_down(cpu_average, cpu_per_instance, removable_instances, count, pending_drains):
+    """
+    Scale down by `count` instances, choosing the least-loaded of `removable_instances`.
+    They are deregistered from the target group in one call and tracked in `pending_drains`;
+    advance_pending_drains() stops them once the ALB has drained their in-flight requests.
+    Returns the IDs being drained.
+    """
+    to_drain = sorted(removable_instances, key=lambda i: cpu_per_instance.get(i, 0.0))[:count]
+    if not to_drain:
+        return []
+    logger.info(f"SCALE DOWN: Draining {to_drain}")
+    elbv2.deregister_targets(TargetGroupArn=target_group_arn, Targets=[{'Id': i, 'Port': 80} for i in to_drain])
+    now = time.time()
+    for instance_id in to_drain:
+        pending_drains[instance_id] = {'requested_at': now, 'cpu_average': cpu_average}
+    send_alert("SCALE DOWN Triggered", f"Low CPU ({cpu_average:.2f}%). Draining {', '.join(to_drain)}.")
+    return to_drain
+
+def advance_pending_drains(pending_drains):
+    """
+    Stop every draining instance whose deregistration has finished (or passed drain_timeout),
+    with one describe_target_health call and one stop_instances call.
+    Instances that stopped running by other means are dropped. Returns the stopped IDs.
+    """
+    if not pending_drains:
+        return []
+    inventory = get_inventory()
+    for instance_id in [i for i in pending_drains if inventory.get(i, {}).get('state') not in ('pending', 'running')]:
+        logger.info(f"Draining instance {instance_id} is no longer running.")
+        del pending_drains[instance_id]
+    if not pending_drains:
+        return []
+
+    response = elbv2.describe_target_health(
+        TargetGroupArn=target_group_arn,
+        Targets=[{'Id': i, 'Port': 80} for i in pending_drains]
+    )
+    still_draining = {
+        target['Target']['Id']
+        for target in response['TargetHealthDescriptions']
+        if target['TargetHealth']['State'] == 'draining'
+    }
+    now = time.time()
+    to_stop = []
+    for instance_id, drain in pending_drains.items():
+        if instance_id not in still_draining:
+            to_stop.append(instance_id)
+        elif now - drain['requested_at'] > drain_timeout:
+            logger.warning(f"Instance {instance_id} still draining after {drain_timeout}s, stopping anyway.")
+            to_stop.append(instance_id)
+    if not to_stop:
+        logger.info(f"Waiting for target deregistration to finish: {list(pending_drains)}")
+        return []
+
+    logger.info(f"SCALE DOWN: Stopping {to_stop}")
+    ec2.stop_instances(InstanceIds=to_stop)
+    invalidate_inventory()
+    for instance_id in to_stop:
+        del pending_drains[instance_id]
+    # Publish running instances metric immediately after scale-down
+    publish_running_instances_metric(len(get_running_instances()[0]))
+    return to_stop
 
 def get_healthy_instance_ids(target_group_arn):
     # Get IDs of all healthy instances in the target group.
@@ -299,13 +1133,37 @@ def update_dashboard(instance_ids):
     - Overall CPU usage
     - ELB Request Count
     - Running Instances count
+    The body is built deterministically and only published when its hash differs from the
+    last published one. Above dashboard_max_instance_widgets instances the per-instance
+    widgets collapse into SEARCH expressions so the body size no longer grows with the fleet.
     """
+    instance_ids = sorted(instance_ids)
+    collapse = len(instance_ids) > dashboard_max_instance_widgets
     widgets = []
     width = 6
     height = 6
     x, y = 0, 0
 
-    for instance_id in instance_ids:
+    if collapse:
+        # SEARCH cannot filter on EC2 tags, so this covers every instance reporting in the region
+        widgets.append({
+            "type": "metric",
+            "x": 0,
+            "y": 0,
+            "width": 24,
+            "height": height,
+            "properties": {
+                "metrics": [
+                    [{"expression": f"SEARCH('{cpu_search_expression}', 'Average', 60)", "id": "cpu"}]
+                ],
+                "title": "CPU per instance",
+                "period": 60,
+                "region": region,
+                "yAxis": {"left": {"min": 0, "max": 100}}
+            }
+        })
+
+    for instance_id in ([] if collapse else instance_ids):
         widget = {
             "type": "metric",
             "x": x,
@@ -338,6 +1196,8 @@ def update_dashboard(instance_ids):
         "height": height,
         "properties": {
             "metrics": [
+                [{"expression": f"AVG(SEARCH('{cpu_search_expression}', 'Average', 60))", "id": "avg", "label": "Average"}]
+            ] if collapse else [
                 ["AWS/EC2", "CPUUtilization", "InstanceId", instance_id]
                 for instance_id in instance_ids
             ],
@@ -373,6 +1233,31 @@ def update_dashboard(instance_ids):
     }
     widgets.append(elb_widget)
 
+    # Tail latency widget, with the objectives the latency sources scale on
+    latency_widget = {
+        "type": "metric",
+        "x": 6,
+        "y": y + height * 2,
+        "width": 6,
+        "height": 6,
+        "properties": {
+            "title": "Target Response Time (p95/p99)",
+            "region": region,
+            "metrics": [
+                ["AWS/ApplicationELB", "TargetResponseTime", "TargetGroup", target_group_arn.split(":")[-1], "LoadBalancer", load_balancer_name, {"stat": "p95"}],
+                ["AWS/ApplicationELB", "TargetResponseTime", "TargetGroup", target_group_arn.split(":")[-1], "LoadBalancer", load_balancer_name, {"stat": "p99"}]
+            ],
+            "period": 60,
+            "view": "timeSeries",
+            "annotations": {"horizontal": [
+                {"label": f"{source['stat']} objective", "value": source['target']}
+                for source in get_metric_sources() if source['metric'] == 'TargetResponseTime'
+            ]},
+            "yAxis": {"left": {"min": 0}}
+        }
+    }
+    widgets.append(latency_widget)
+
     # Running Instances Count widget
     running_instances_widget = {
         "type": "metric",
@@ -382,7 +1267,7 @@ def update_dashboard(instance_ids):
         "height": 6,
         "properties": {
             "metrics": [
-                ["AutoScalingMonitoring", "RunningInstances"]
+                [metrics_namespace, "RunningInstances"]
             ],
             "title": "Number of Running Instances",
             "region": region,
@@ -398,25 +1283,122 @@ def update_dashboard(instance_ids):
         "widgets": widgets
     }
 
+    body = json.dumps(dashboard_body, sort_keys=True, separators=(',', ':'))
+    body_hash = hashlib.sha256(body.encode()).hexdigest()
+    try:
+        with open(dashboard_hash_file) as f:
+            published_hash = f.read().strip()
+    except OSError:
+        published_hash = None
+    described = f"{len(instance_ids)} instances" if collapse else instance_ids
+    if body_hash == published_hash:
+        logger.info(f"CloudWatch dashboard unchanged for instances: {described}")
+        return
+
     cloudwatch.put_dashboard(
-        DashboardName='AutoScalingMonitoring',
-        DashboardBody=json.dumps(dashboard_body)
+        DashboardName=dashboard_name,
+        DashboardBody=body
     )
-    logger.info(f"CloudWatch dashboard updated for instances: {instance_ids}")
+    with open(dashboard_hash_file, 'w') as f:
+        f.write(body_hash)
+    logger.info(f"CloudWatch dashboard updated for instances: {described}")
 
 # --- Main run logic ---
 def main():
     """
     Main autoscaling control loop:
+    - Advances pending launches from earlier ticks
     - Retrieves CPU metrics
-    - Compares against thresholds
+    - Compares against thresholds (or sizes the fleet to the target-tracking setpoint)
     - Triggers scale up or down actions
     - Updates monitoring dashboard
     """
+    global _startup_timings
+    tick_started = time.monotonic()
+    if ec2 is None:
+        create_clients()
+    # Process startup (credentials, clients) is reported once, as part of the first tick
+    tracing.start_tick(sum(_startup_timings.values()))
+    for phase, seconds in _startup_timings.items():
+        tracing.record_phase(phase, seconds)
+    _startup_timings = {}
+
+    invalidate_inventory()
+    with tracing.span('state'):
+        alerts.start(publish_alert, alert_window, load_json_state(alert_state_file), alert_subject_prefix)
+        pending_launches = load_json_state(pending_launches_file)
+        pending_drains = load_json_state(pending_drains_file)
+        history = load_json_state(history_file) if predictive_scaling else None
+        tracking_state = load_json_state(target_tracking_state_file) if target_tracking else None
+    try:
+        evaluate(pending_launches, history, pending_drains, tracking_state)
+    finally:
+        if drain_alerts_each_tick:
+            with tracing.span('alerts'):
+                alerts.drain(alert_drain_timeout)
+        with tracing.span('state'):
+            save_json_state(pending_launches_file, pending_launches)
+            save_json_state(pending_drains_file, pending_drains)
+            if history is not None:
+                save_json_state(history_file, history)
+            if tracking_state is not None:
+                save_json_state(target_tracking_state_file, tracking_state)
+            save_json_state(alert_state_file, alerts.snapshot(alert_subject_prefix))
+        # Controller self-metrics ride along in the tick's single metrics flush
+        emit_metric('PendingLaunches', len(pending_launches))
+        emit_metric('PendingDrains', len(pending_drains))
+        emit_metric('TickDuration', time.monotonic() - tick_started, 'Seconds')
+        try:
+            with tracing.span('metrics_flush'):
+                flush_metrics()
+        except Exception as e:
+            logger.error(f"Failed to publish metrics: {e}")
+        report_tick_trace(tracing.finish_tick())
+
+def report_tick_trace(trace):
+    # Write the tick's phase timings and AWS call log to the configured outputs.
+    try:
+        if trace_file:
+            tracing.write_jsonl(trace, trace_file)
+        if prometheus_textfile:
+            tracing.write_prometheus(trace, prometheus_textfile)
+    except OSError as e:
+        logger.error(f"Failed to write tick trace: {e}")
+    if profile_ticks:
+        print(tracing.format_breakdown(trace), flush=True)
+
+def evaluate(pending_launches, history=None, pending_drains=None, tracking_state=None):
+    """
+    One tick of the control loop. `pending_launches` and `pending_drains` are advanced and
+    updated in place; when `history` is given (predictive scaling) the tick's load is
+    recorded in it and decisions use the forecast load. In target-tracking mode the PI
+    integral is kept in `tracking_state`.
+    """
+    if pending_drains is None:
+        pending_drains = {}
+    if tracking_state is None:
+        tracking_state = {}
     end_time = datetime.now(timezone.utc)
     start_time = end_time - timedelta(minutes=5)
 
+    with tracing.span('state'):
+        store = get_metric_store()
+
+    with tracing.span('inventory'):
+        get_inventory()
+
+    with tracing.span('launches'):
+        became_healthy = advance_pending_launches(pending_launches)
+    with tracing.span('drains'):
+        advance_pending_drains(pending_drains)
+    if history is not None:
+        # Track how long new capacity really takes to arrive; that is how far ahead to forecast
+        for seconds in became_healthy.values():
+            history['lead_time'] = forecast.ewma(history.get('lead_time'), seconds)
+
     all_running_instances, primary_instances = get_running_instances()
+    # Instances being drained no longer serve traffic and take no part in decisions
+    all_running_instances = [i for i in all_running_instances if i not in pending_drains]
 
     if not all_running_instances:
         logger.warning("No running instances detected. Exiting.")
@@ -427,39 +1409,169 @@ def main():
 
     publish_running_instances_metric(len(all_running_instances))
 
-    cpu_per_instance = {}
-    for instance_id in all_running_instances:
-        cpu_per_instance[instance_id] = get_cpu_utilization(instance_id, start_time, end_time)
+    # Every metric source (and the request count for forecasting) comes back from one batched fetch
+    metrics, extra_queries = policy_metric_queries()
+    if history is not None:
+        extra_queries.append(alb_metric_query('forecast_requests', 'RequestCount', 'Sum'))
+    with tracing.span('metrics'):
+        cpu_per_instance, results = get_fleet_cpu_utilization(all_running_instances, start_time, end_time, metrics, extra_queries, store)
 
     overall_avg_cpu = sum(cpu_per_instance.values()) / len(cpu_per_instance)
     logger.info(f"Overall average CPU utilization: {overall_avg_cpu:.2f}%")
 
-    threshold_high = 70
-    threshold_low = 30
+    with tracing.span('decision'):
+        # Combined load over the whole fleet, and over the instances actually serving;
+        # capacity already on its way counts towards the target
+        fleet_load, loads = policy_load(results, all_running_instances)
+        serving = [i for i in all_running_instances if i not in pending_launches]
+        serving_load, _ = policy_load(results, serving)
+        load_summary = ', '.join(f"{name} {load:.2f}%" for name, load in loads.items())
+        logger.info(f"Policy loads: {load_summary} -> {policy_combine_rule} {fleet_load:.2f}%")
+        if pending_launches:
+            logger.info(f"Pending launches: {list(pending_launches)}")
+        if pending_drains:
+            logger.info(f"Draining: {list(pending_drains)}")
+        fleet_size = len(set(all_running_instances) | set(pending_launches))
+        removable = [i for i in all_running_instances if i not in primary_instances and i not in pending_launches]
+        # Scale-out is sized in the capacity units launches are planned in
+        serving_units = capacity_units(serving)
+        pending_units = capacity_units(pending_launches)
+
+        # Predictive mode decides on the larger of current and forecast load, so it scales out
+        # ahead of a ramp but never scales in while the forecast is still high
+        decision_cpu_total = serving_load * len(serving)
+        decision_avg_cpu = fleet_load
+        if history is not None and serving:
+            predicted_cpu_total = forecast_load(history, time.time(), decision_cpu_total, results['forecast_requests'])
+            decision_cpu_total = max(decision_cpu_total, predicted_cpu_total)
+            decision_avg_cpu = max(fleet_load, predicted_cpu_total / len(serving))
+            logger.info(f"Predicted average CPU utilization: {predicted_cpu_total / len(serving):.2f}%")
 
-    # If CPU utilization is high, scale up
-    new_instance_id = None
-    if overall_avg_cpu > threshold_high:
-        new_instance_id = scale_up(overall_avg_cpu)
-        if new_instance_id:
-            cpu_per_instance[new_instance_id] = 0.0
-            all_running_instances.append(new_instance_id)  # Add new instance to the list
+        if target_tracking:
+            change, tracking_state['integral'] = target_tracking_decision(
+                decision_cpu_total, len(serving), len(pending_launches), fleet_size, len(removable),
+                tracking_state.get('integral', 0.0), serving_units=serving_units, pending_units=pending_units)
+            logger.info(f"Target tracking: {decision_avg_cpu:.2f}% against {target_tracking_cpu}% on {len(serving)} serving, "
+                        f"{len(pending_launches)} pending -> change {change:+d} (integral {tracking_state['integral']:.3f})")
+        else:
+            change = scaling_decision(decision_avg_cpu, decision_cpu_total, len(serving), len(pending_launches),
+                                      fleet_size, len(removable), serving_units=serving_units, pending_units=pending_units)
+        # Cooldowns hold an action back for a while after the previous ones, without any API calls
+        now = time.time()
+        cooldown = cooldown_remaining(store, 'scale_up' if change > 0 else 'scale_down', now) if change else 0
+    emit_metric('ScalingDecision', change)
 
-    # If CPU utilization is low, scale down
-    elif overall_avg_cpu < threshold_low:
-        scale_down(overall_avg_cpu, all_running_instances, primary_instances)
+    with tracing.span('scaling'):
+        # If load is high, scale up proportionally to the excess load
+        if cooldown:
+            logger.info(f"NO SCALING – {'scale-out' if change > 0 else 'scale-in'} cooldown, {cooldown:.0f}s remaining.")
+        elif change > 0:
+            # Target tracking reaches its size in one action; threshold mode adds at most max_scale_up_step instances
+            room = max_instances - fleet_size
+            started = scale_up(decision_avg_cpu, pending_launches, change, room if target_tracking else min(max_scale_up_step, room))
+            if store is not None and started:
+                metric_store.record_action(store, now, 'scale_up', len(started))
 
-    else:
-        logger.info("NO SCALING – CPU usage within acceptable range.")
+        # If load is low on every source, drain and stop the least-loaded instances the rest can absorb
+        # (never one that is still launching)
+        elif change < 0:
+            draining = scale_down(decision_avg_cpu, cpu_per_instance, removable, -change, pending_drains)
+            if store is not None and draining:
+                metric_store.record_action(store, now, 'scale_down', len(draining))
+        elif target_tracking:
+            logger.info("NO SCALING – fleet is at the target-tracking capacity.")
+        elif decision_avg_cpu > threshold_high:
+            if fleet_size >= max_instances:
+                logger.info(f"NO SCALING – fleet already at max_instances ({max_instances}).")
+            else:
+                logger.info("NO SCALING – pending launches cover the current load.")
+        elif decision_avg_cpu < threshold_low:
+            if removable:
+                logger.info("NO SCALING – remaining instances are needed at the target utilization.")
+            elif pending_drains:
+                logger.info("NO SCALING – waiting for draining instances to stop.")
+            else:
+                logger.info("No non-primary instances to stop. Skipping.")
+                send_alert("SCALE DOWN Skipped", "Only primary instances are running.")
+
+        else:
+            logger.info("NO SCALING – load within acceptable range.")
+
+    if warm_pool_size > 0:
+        with tracing.span('warm_pool'):
+            maintain_warm_pool()
 
     # Now, update the dashboard with all instances (new and existing)
-    healthy_instance_ids = get_healthy_instance_ids(target_group_arn)
+    with tracing.span('target_health'):
+        healthy_instance_ids = get_healthy_instance_ids(target_group_arn)
 
     if not healthy_instance_ids:
         logger.warning("⚠️ No healthy instances found in target group.")
 
     # Update the dashboard after scaling (with the latest state of healthy instances)
-    update_dashboard(healthy_instance_ids)  # always update dashboard after scaling
+    with tracing.span('dashboard'):
+        update_dashboard(healthy_instance_ids)  # always update dashboard after scaling
+
+def handle_shutdown(signum, frame):
+    # Signal handler: let the current tick finish, then leave the daemon loop.
+    logger.info(f"Received signal {signal.Signals(signum).name}. Shutting down after current tick.")
+    shutdown_event.set()
+
+def run_daemon(interval):
+    """
+    Run main() repeatedly in one process, reusing the AWS clients and their
+    connection pools between ticks. Ticks start every `interval` seconds
+    (sub-minute intervals are allowed); a tick that overruns starts the next one immediately.
+    """
+    global drain_alerts_each_tick
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+    drain_alerts_each_tick = False
+    logger.info(f"Starting autoscaler daemon with {interval}s tick interval.")
+
+    while not shutdown_event.is_set():
+        tick_started = time.monotonic()
+        try:
+            main()
+        except Exception:
+            # A failed tick must not kill the daemon; the next tick retries from fresh state
+            logger.exception("Autoscaler tick failed.")
+        elapsed = time.monotonic() - tick_started
+        shutdown_event.wait(max(0.0, interval - elapsed))
+
+    # Publish alerts still held back by the rate limit before exiting
+    alerts.flush_all(alert_drain_timeout)
+    save_json_state(alert_state_file, alerts.snapshot(alert_subject_prefix))
+    logger.info("Autoscaler daemon stopped.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Threshold-based EC2 autoscaler.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="run continuously instead of a single tick (for use without cron)")
+    parser.add_argument('--interval', type=float, default=default_tick_interval,
+                        help=f"seconds between ticks in daemon mode (default: {default_tick_interval})")
+    parser.add_argument('--bake-ami', metavar='INSTANCE_ID',
+                        help="create an AMI from a bootstrapped instance and exit")
+    parser.add_argument('--profile', action='store_true',
+                        help="print a per-tick breakdown of phase timings and AWS calls")
+    parser.add_argument('--predictive', action='store_true',
+                        help="scale on forecast load at now + provisioning lead time")
+    parser.add_argument('--target-tracking', action='store_true',
+                        help="size the fleet to the target_tracking_cpu setpoint every tick instead of using thresholds")
+    args = parser.parse_args(argv)
+    if args.interval <= 0:
+        parser.error("--interval must be positive")
+    return args
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    predictive_scaling = args.predictive
+    target_tracking = args.target_tracking
+    profile_ticks = args.profile
+    if args.bake_ami:
+        create_clients()
+        print(bake_ami(args.bake_ami))
+    elif args.daemon:
+        run_daemon(args.interval)
+    else:
+        main()
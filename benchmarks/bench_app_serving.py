@@ -0,0 +1,129 @@
+"""
+Compare Flask's development server with gunicorn for app.py.
+
+Starts the app locally in each serving mode, drives the CPU-burning / route from
+`--concurrency` client threads for `--duration` seconds while probing /health every
+100 ms, and prints / throughput and /health latency. A probe that takes longer
+than `--health-timeout` counts as failed, as it would for an ALB health check.
+Needs flask and gunicorn installed locally.
+
+Usage: python benchmarks/bench_app_serving.py [--concurrency 8] [--duration 20] [--workers N]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, workers):
+    env = dict(os.environ)
+    if mode == 'flask':
+        env['APP_PORT'] = str(port)
+        command = [sys.executable, 'app.py']
+    else:
+        env['APP_BIND'] = f"127.0.0.1:{port}"
+        if workers:
+            env['APP_WORKERS'] = str(workers)
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', 'app:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            get(port, '/health', 1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def get(port, path, timeout):
+    # One request on a fresh connection, as the ALB health checker makes them; returns the latency.
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise OSError(f"HTTP {response.status}")
+    finally:
+        connection.close()
+    return time.perf_counter() - started
+
+
+def run(mode, concurrency, duration, health_timeout, workers):
+    port = free_port()
+    process = start_server(mode, port, workers)
+    stop = threading.Event()
+    completed = []
+    health = []
+    health_failures = []
+
+    def burner():
+        while not stop.is_set():
+            try:
+                get(port, '/', 30)
+                completed.append(time.perf_counter())
+            except OSError:
+                pass
+
+    def prober():
+        while not stop.is_set():
+            try:
+                health.append(get(port, '/health', health_timeout))
+            except OSError:
+                health_failures.append(1)
+            stop.wait(0.1)
+
+    threads = [threading.Thread(target=burner) for _ in range(concurrency)] + [threading.Thread(target=prober)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    health.sort()
+    probes = len(health) + len(health_failures)
+    return {
+        'throughput': len(completed) / duration,
+        'health_p50': health[len(health) // 2] * 1000 if health else float('nan'),
+        'health_p99': health[min(len(health) - 1, int(len(health) * 0.99))] * 1000 if health else float('nan'),
+        'health_failed': len(health_failures) / probes if probes else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads requesting /')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per serving mode')
+    parser.add_argument('--health-timeout', type=float, default=5.0, help='seconds before a /health probe fails')
+    parser.add_argument('--workers', type=int, help='gunicorn workers (default: gunicorn_conf.py sizing)')
+    args = parser.parse_args()
+
+    print(f"{'server':>8} | {'/ req/s':>8} | {'health p50 ms':>13} {'health p99 ms':>13} {'health failed':>13}")
+    for mode in ('flask', 'gunicorn'):
+        result = run(mode, args.concurrency, args.duration, args.health_timeout, args.workers)
+        print(f"{mode:>8} | {result['throughput']:>8.2f} | {result['health_p50']:>13.1f} "
+              f"{result['health_p99']:>13.1f} {result['health_failed']:>13.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare per-instance GetMetricStatistics calls with batched GetMetricData calls.
+
+Runs both fetch paths of autoscale.py against a stubbed CloudWatch client that
+adds a fixed latency to every API call, and prints call count and wall time
+for a range of fleet sizes. No AWS credentials are needed.
+
+Usage: python benchmarks/bench_metric_fetch.py [--latency-ms 40] [--sizes 1,10,50,100,500,1000]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-north-1')
+
+import autoscale  # noqa: E402
+
+
+class StubCloudWatch:
+    # Minimal CloudWatch stand-in returning five 1-minute datapoints per metric.
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def _timestamps(self, end_time):
+        return [end_time - timedelta(minutes=m) for m in range(5)]
+
+    def get_metric_statistics(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {'Datapoints': [
+            {'Timestamp': ts, 'Average': 50.0} for ts in self._timestamps(kwargs['EndTime'])
+        ]}
+
+    def get_metric_data(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        timestamps = self._timestamps(kwargs['EndTime'])
+        return {'MetricDataResults': [
+            {'Id': q['Id'], 'Timestamps': timestamps, 'Values': [50.0] * len(timestamps)}
+            for q in kwargs['MetricDataQueries']
+        ]}
+
+
+def run(fleet_size, latency):
+    instance_ids = [f"i-{n:017x}" for n in range(fleet_size)]
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(minutes=5)
+
+    stub = StubCloudWatch(latency)
+    autoscale.cloudwatch = stub
+    started = time.perf_counter()
+    for instance_id in instance_ids:
+        autoscale.get_cpu_utilization(instance_id, start_time, end_time)
+    loop = (stub.calls, time.perf_counter() - started)
+
+    stub = StubCloudWatch(latency)
+    autoscale.cloudwatch = stub
+    started = time.perf_counter()
+    autoscale.get_fleet_cpu_utilization(instance_ids, start_time, end_time)
+    batched = (stub.calls, time.perf_counter() - started)
+    return loop, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='simulated latency per API call')
+    parser.add_argument('--sizes', default='1,10,50,100,500,1000', help='comma-separated fleet sizes')
+    args = parser.parse_args()
+
+    logging.getLogger('autoscale').setLevel(logging.WARNING)
+    print(f"{'instances':>9} | {'loop calls':>10} {'loop s':>8} | {'batch calls':>11} {'batch s':>8} | {'speedup':>7}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        (loop_calls, loop_s), (batch_calls, batch_s) = run(size, args.latency_ms / 1000)
+        print(f"{size:>9} | {loop_calls:>10} {loop_s:>8.3f} | {batch_calls:>11} {batch_s:>8.3f} | {loop_s / batch_s:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
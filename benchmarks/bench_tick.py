@@ -0,0 +1,460 @@
+"""
+End-to-end benchmark of autoscale.py ticks against an in-process AWS stand-in.
+
+FakeAWS models the group's EC2 instances, the ALB target group and CloudWatch:
+- every API call adds --latency-ms, and a fraction (--throttle-rate) of calls is
+  throttled and retried with capped exponential backoff and jitter, as botocore's
+  standard retry mode does
+- instances take --boot-delay seconds to run (--start-delay from stopped), and
+  registered targets take --health-delay seconds to pass health checks
+- CPU, request count and response time come from a demand model spread over the
+  healthy targets
+The controller runs unmodified, as a private copy of the module (as multi_group.py
+loads groups), with its clock replaced by a virtual one: API latency, backoff and
+the time between ticks advance virtual time, so an hour of ticks runs in seconds.
+
+For each fleet size the benchmark reports:
+- steady state: real wall time per tick (the controller's own overhead), virtual
+  tick time (overhead plus API latency) and API calls per tick
+- scale-out: after demand doubles, the virtual time and ticks until the healthy
+  fleet serves it at a load where the controller stops scaling out (time-to-capacity:
+  at or below target_tracking_cpu in target-tracking mode, threshold_high otherwise),
+  and the API calls spent getting there
+- throttled API attempts, and ticks that failed because a call was still throttled
+  after its retries (the tick is abandoned and the next one runs, as in daemon mode)
+
+The controller keeps its own defaults (every profiled instance type, its warm
+pool); --instance-types and --no-warm-pool narrow them to isolate one effect.
+
+Usage: python benchmarks/bench_tick.py [--sizes 1,10,50,100,500] [--latency-ms 40]
+           [--throttle-rate 0.05] [--target-tracking] [--instance-types t3.micro]
+           [--no-warm-pool] [--json results.json]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-north-1')
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import multi_group  # noqa: E402
+
+START = datetime(2025, 9, 1, tzinfo=timezone.utc).timestamp()
+DESCRIBE_PAGE_SIZE = 1000
+
+
+class VirtualClock:
+    # Stand-in for the time module: time(), monotonic() and sleep() read and advance virtual seconds.
+
+    def __init__(self, now):
+        self.now = now
+        self.lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+    def datetime_class(self):
+        # datetime subclass whose now() is the virtual time
+        clock = self
+
+        class VirtualDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls.fromtimestamp(clock.now, tz)
+
+        return VirtualDatetime
+
+
+class FakeAWS:
+    """
+    In-process EC2, ELBv2, CloudWatch and SNS for one scaling group. Instance and target
+    states are derived from the virtual clock when read, so lifecycle delays need no threads.
+    """
+
+    def __init__(self, clock, latency, throttle_rate, boot_delay, start_delay, health_delay,
+                 drain_delay=30.0, stop_delay=20.0, max_attempts=3, seed=0):
+        self.clock = clock
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.boot_delay = boot_delay
+        self.start_delay = start_delay
+        self.health_delay = health_delay
+        self.drain_delay = drain_delay
+        self.stop_delay = stop_delay
+        self.max_attempts = max_attempts
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.instances = {}
+        self.targets = {}
+        self.demand = 0.0  # instance-percent: 100 is one instance fully busy
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.next_id = 0
+
+    # --- fleet model ---
+
+    def add_instance(self, tags=(), state='running', healthy=True, instance_type='t3.micro'):
+        self.next_id += 1
+        instance_id = f"i-{self.next_id:017x}"
+        self.instances[instance_id] = {'state': state, 'until': None, 'then': None, 'tags': dict(tags),
+                                       'type': instance_type, 'launch_time': self.clock.now}
+        if healthy:
+            self.targets[instance_id] = {'state': 'healthy', 'until': None}
+        return instance_id
+
+    def _transition(self, instance, state, delay, then):
+        instance.update(state=state, until=self.clock.now + delay, then=then)
+
+    def _refresh(self):
+        now = self.clock.now
+        for instance in self.instances.values():
+            while instance['until'] is not None and now >= instance['until']:
+                instance.update(state=instance['then'], until=None, then=None)
+                # Warm pool instances stop themselves once bootstrapped
+                if instance['state'] == 'running' and 'WarmPool' in instance['tags']:
+                    self._transition(instance, 'running', self.health_delay, 'stopping')
+                elif instance['state'] == 'stopping':
+                    self._transition(instance, 'stopping', self.stop_delay, 'stopped')
+        for instance_id, target in list(self.targets.items()):
+            instance = self.instances[instance_id]
+            if target['state'] == 'draining' and now >= target['until']:
+                del self.targets[instance_id]
+            elif target['state'] == 'initial' and instance['state'] == 'running':
+                if target['until'] is None:
+                    target['until'] = now + self.health_delay
+                elif now >= target['until']:
+                    target.update(state='healthy', until=None)
+            elif target['state'] == 'healthy' and instance['state'] != 'running':
+                target.update(state='unhealthy', until=None)
+
+    def serving(self):
+        self._refresh()
+        return [i for i, t in self.targets.items() if t['state'] == 'healthy']
+
+    def utilization(self):
+        # Per-instance CPU fraction of the healthy targets
+        serving = self.serving()
+        return min(1.0, self.demand / 100.0 / len(serving)) if serving else 1.0
+
+    # --- API plumbing ---
+
+    def call(self, operation):
+        # Count a call and charge its latency, retrying throttled attempts with backoff
+        with self.lock:
+            self.calls[operation] += 1
+            for attempt in range(self.max_attempts):
+                if self.random.random() >= self.throttle_rate:
+                    self.clock.advance(self.latency)
+                    return
+                self.throttled[operation] += 1
+                self.clock.advance(self.latency + self.random.random() * min(20.0, 2 ** attempt))
+        raise ClientError({'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}, operation)
+
+
+class FakeEC2:
+
+    def __init__(self, aws):
+        self.aws = aws
+
+    def get_paginator(self, name):
+        aws = self.aws
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                aws._refresh()
+                instance_ids = list(aws.instances)
+                for offset in range(0, max(len(instance_ids), 1), DESCRIBE_PAGE_SIZE):
+                    aws.call('DescribeInstances')
+                    yield {'Reservations': [{'Instances': [
+                        {'InstanceId': i, 'State': {'Name': aws.instances[i]['state']},
+                         'Tags': [{'Key': k, 'Value': v} for k, v in aws.instances[i]['tags'].items()],
+                         'LaunchTime': datetime.fromtimestamp(aws.instances[i]['launch_time'], timezone.utc),
+                         'InstanceType': aws.instances[i]['type']}
+                        for i in instance_ids[offset:offset + DESCRIBE_PAGE_SIZE]
+                    ]}]}
+
+        return Paginator()
+
+    def run_instances(self, MinCount, MaxCount, InstanceType, TagSpecifications, **kwargs):
+        self.aws.call('RunInstances')
+        tags = {t['Key']: t['Value'] for spec in TagSpecifications for t in spec['Tags']}
+        launched = []
+        for _ in range(MaxCount):
+            instance_id = self.aws.add_instance(tags, 'pending', healthy=False, instance_type=InstanceType)
+            self.aws._transition(self.aws.instances[instance_id], 'pending', self.aws.boot_delay, 'running')
+            launched.append({'InstanceId': instance_id})
+        return {'Instances': launched}
+
+    def start_instances(self, InstanceIds):
+        self.aws.call('StartInstances')
+        for instance_id in InstanceIds:
+            self.aws._transition(self.aws.instances[instance_id], 'pending', self.aws.start_delay, 'running')
+
+    def stop_instances(self, InstanceIds):
+        self.aws.call('StopInstances')
+        for instance_id in InstanceIds:
+            self.aws._transition(self.aws.instances[instance_id], 'stopping', self.aws.stop_delay, 'stopped')
+
+    def terminate_instances(self, InstanceIds):
+        self.aws.call('TerminateInstances')
+        for instance_id in InstanceIds:
+            self.aws._transition(self.aws.instances[instance_id], 'shutting-down', self.aws.stop_delay, 'terminated')
+
+    def delete_tags(self, Resources, Tags):
+        self.aws.call('DeleteTags')
+        for instance_id in Resources:
+            for tag in Tags:
+                self.aws.instances[instance_id]['tags'].pop(tag['Key'], None)
+
+
+class FakeELBv2:
+
+    def __init__(self, aws):
+        self.aws = aws
+
+    def register_targets(self, TargetGroupArn, Targets):
+        self.aws.call('RegisterTargets')
+        for target in Targets:
+            self.aws.targets[target['Id']] = {'state': 'initial', 'until': None}
+
+    def deregister_targets(self, TargetGroupArn, Targets):
+        self.aws.call('DeregisterTargets')
+        for target in Targets:
+            if target['Id'] in self.aws.targets:
+                self.aws.targets[target['Id']] = {'state': 'draining', 'until': self.aws.clock.now + self.aws.drain_delay}
+
+    def describe_target_health(self, TargetGroupArn, Targets=None):
+        self.aws.call('DescribeTargetHealth')
+        self.aws._refresh()
+        ids = [t['Id'] for t in Targets] if Targets is not None else list(self.aws.targets)
+        return {'TargetHealthDescriptions': [
+            {'Target': {'Id': i, 'Port': 80}, 'TargetHealth': {'State': self.aws.targets[i]['state'] if i in self.aws.targets else 'unused'}}
+            for i in ids
+        ]}
+
+
+class FakeCloudWatch:
+    # Metrics of the demand model: CPU of serving instances, ALB request counts and queueing latency.
+
+    def __init__(self, aws):
+        self.aws = aws
+
+    def _value(self, metric, stat, instance_id, serving, utilization):
+        if metric == 'CPUUtilization':
+            return 100.0 * utilization if instance_id in serving else 2.0
+        if metric == 'mem_used_percent':
+            return 40.0
+        if metric == 'RequestCountPerTarget':
+            return 240.0 * utilization  # a request costs 0.5 s of CPU on 2 vCPUs
+        if metric == 'RequestCount':
+            return 240.0 * utilization * len(serving)
+        if metric == 'TargetResponseTime':
+            # Service time of 0.5 s plus queueing that reaches the p95/p99 objectives at 60% CPU
+            return 0.5 + (0.3 if stat == 'p95' else 1.0) * (utilization / 0.6) ** 4
+        return 0.0
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, **kwargs):
+        self.aws.call('GetMetricData')
+        serving = set(self.aws.serving())
+        utilization = self.aws.utilization()
+        # One datapoint per minute, published a minute late
+        last = int(min(EndTime.timestamp(), self.aws.clock.now - 60) // 60) * 60
+        first = int(StartTime.timestamp() // 60) * 60
+        timestamps = [datetime.fromtimestamp(t, timezone.utc) for t in range(last, first - 1, -60)]
+        results = []
+        for query in MetricDataQueries:
+            stat = query['MetricStat']
+            dimensions = {d['Name']: d['Value'] for d in stat['Metric']['Dimensions']}
+            value = self._value(stat['Metric']['MetricName'], stat['Stat'], dimensions.get('InstanceId'), serving, utilization)
+            results.append({'Id': query['Id'], 'Timestamps': timestamps, 'Values': [value] * len(timestamps)})
+        return {'MetricDataResults': results}
+
+    def put_metric_data(self, **kwargs):
+        self.aws.call('PutMetricData')
+
+    def put_dashboard(self, **kwargs):
+        self.aws.call('PutDashboard')
+
+
+class FakeSNS:
+
+    def __init__(self, aws):
+        self.aws = aws
+
+    def publish(self, **kwargs):
+        self.aws.call('Publish')
+
+
+def load_controller(aws, clock, state_dir, settings):
+    # A private autoscale.py copy wired to the fake clients and the virtual clock.
+    clients = {'ec2': FakeEC2(aws), 'elbv2': FakeELBv2(aws), 'cloudwatch': FakeCloudWatch(aws), 'sns': FakeSNS(aws)}
+    module = multi_group.load_group('bench', settings, clients, state_dir)
+    module.time = clock
+    module.datetime = clock.datetime_class()
+    module.trace_file = None
+    return module
+
+
+def make_fleet(aws, size, cpu):
+    # `size` running, healthy instances (the first one primary), each at `cpu` percent
+    aws.add_instance({'Role': 'Primary'})
+    for _ in range(size - 1):
+        aws.add_instance({'Purpose': 'ScaledInstance'})
+    aws.demand = cpu * size
+
+
+def run_tick(controller, aws, clock):
+    """
+    One controller tick: (real seconds, virtual seconds, API calls made, failed). As in daemon
+    mode, a tick that raises (e.g. a call still throttled after its retries) fails and the
+    next tick starts afresh.
+    """
+    calls_before = sum(aws.calls.values())
+    virtual_started = clock.now
+    started = time.perf_counter()
+    try:
+        controller.main()
+        failed = False
+    except Exception:
+        failed = True
+    return time.perf_counter() - started, clock.now - virtual_started, sum(aws.calls.values()) - calls_before, failed
+
+
+def bench_size(size, args):
+    clock = VirtualClock(START)
+    aws = FakeAWS(clock, args.latency_ms / 1000, args.throttle_rate, args.boot_delay, args.start_delay,
+                  args.health_delay, seed=args.seed)
+    settings = {
+        'max_instances': 3 * size + 10,
+        'target_tracking': args.target_tracking,
+    }
+    if args.instance_types:
+        settings['candidate_instance_types'] = args.instance_types
+    if args.no_warm_pool:
+        settings['warm_pool_size'] = 0
+    with tempfile.TemporaryDirectory() as state_dir:
+        controller = load_controller(aws, clock, state_dir, settings)
+        target_cpu = controller.target_tracking_cpu if args.target_tracking else controller.scale_up_target_cpu
+        settled_cpu = controller.target_tracking_cpu if args.target_tracking else controller.threshold_high
+        # Just under the target: inside the threshold band, and within the target-tracking scale-in tolerance
+        make_fleet(aws, size, 0.95 * target_cpu)
+
+        # Steady state: nothing to do but observe
+        ticks = []
+        for tick in range(args.warmup + args.ticks):
+            if tick == args.warmup:
+                calls_before = Counter(aws.calls)
+            tick_started = clock.now
+            ticks.append(run_tick(controller, aws, clock))
+            clock.now = max(clock.now, tick_started + args.interval)
+        ticks = ticks[args.warmup:]
+        steady_calls = aws.calls - calls_before
+
+        # Scale-out: demand doubles; tick until the healthy fleet serves it at the target
+        aws.demand *= 2
+        step_at = clock.now
+        calls_before = Counter(aws.calls)
+        scale_ticks = 0
+        scale_failed = 0
+        time_to_capacity = None
+        while clock.now - step_at < args.horizon:
+            if len(aws.serving()) * settled_cpu >= aws.demand:
+                time_to_capacity = clock.now - step_at
+                break
+            tick_started = clock.now
+            scale_failed += run_tick(controller, aws, clock)[3]
+            scale_ticks += 1
+            clock.now = max(clock.now, tick_started + args.interval)
+        if controller._metric_store is not None:
+            controller._metric_store.close()
+
+    scale_calls = aws.calls - calls_before
+    return {
+        'size': size,
+        'tick_wall_ms': statistics.median(t[0] for t in ticks) * 1000,
+        'tick_virtual_s': statistics.median(t[1] for t in ticks),
+        'calls_per_tick': statistics.mean(t[2] for t in ticks),
+        'steady_calls': {op: n / args.ticks for op, n in sorted(steady_calls.items())},
+        'time_to_capacity_s': time_to_capacity,
+        'scale_ticks': scale_ticks,
+        'scale_calls': dict(sorted(scale_calls.items())),
+        'throttled': sum(aws.throttled.values()),
+        'failed_ticks': sum(t[3] for t in ticks) + scale_failed,
+        'final_serving': len(aws.serving()),
+    }
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',')]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,10,50,100,500', help="comma-separated fleet sizes")
+    parser.add_argument('--latency-ms', type=float, default=40.0, help="latency added to every API call")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of API attempts throttled")
+    parser.add_argument('--boot-delay', type=float, default=40.0, help="seconds from launch to running")
+    parser.add_argument('--start-delay', type=float, default=20.0, help="seconds from start to running")
+    parser.add_argument('--health-delay', type=float, default=60.0, help="seconds from registration to healthy")
+    parser.add_argument('--interval', type=float, default=60.0, help="virtual seconds between ticks")
+    parser.add_argument('--ticks', type=int, default=5, help="measured steady-state ticks")
+    parser.add_argument('--warmup', type=int, default=2, help="steady-state ticks before measuring")
+    parser.add_argument('--horizon', type=float, default=3600.0, help="virtual seconds allowed to reach capacity")
+    parser.add_argument('--target-tracking', action='store_true', help="run the controller in target-tracking mode")
+    parser.add_argument('--instance-types', type=lambda v: v.split(','),
+                        help="comma-separated candidate instance types (default: every profiled type)")
+    parser.add_argument('--no-warm-pool', action='store_true', help="run without the controller's warm pool")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(',')]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger('autoscale').setLevel(logging.ERROR)
+    logging.getLogger('multi_group').setLevel(logging.WARNING)
+
+    results = []
+    print(f"{'instances':>9} | {'tick ms':>8} {'virtual s':>9} {'calls':>6} | {'to capacity s':>13} {'ticks':>5} {'calls':>6} | "
+          f"{'throttled':>9} {'failed':>6}")
+    for size in args.sizes:
+        result = bench_size(size, args)
+        results.append(result)
+        reached = f"{result['time_to_capacity_s']:.0f}" if result['time_to_capacity_s'] is not None else f">{args.horizon:.0f}"
+        print(f"{size:>9} | {result['tick_wall_ms']:>8.1f} {result['tick_virtual_s']:>9.2f} {result['calls_per_tick']:>6.1f} | "
+              f"{reached:>13} {result['scale_ticks']:>5} {sum(result['scale_calls'].values()):>6} | "
+              f"{result['throttled']:>9} {result['failed_ticks']:>6}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': {k: v for k, v in vars(args).items() if k != 'json'}, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Capacity model and instance-type selection for autoscale.py.
+
+capacity_profiles.json records, per instance type, the measured request rate one
+instance sustains at the target CPU (rps_at_target), the rate it falls back to once
+a burstable instance has exhausted its CPU credits (baseline_rps), its vCPU count
+and its on-demand hourly price. Burstable types are planned either on their
+baseline (credit mode 'standard': sustained load drains the credits) or at full
+rate plus the surplus-credit charge for running above baseline ('unlimited').
+cheapest_mix() picks the type, or mix of types, that covers a demand at the lowest
+hourly cost.
+
+The measured figures come from load-test timelines (locustfile.py) run against a
+single instance of each type:
+    python capacity.py measure t3.micro loadtest_results/step-*.jsonl --soak loadtest_results/soak-*.jsonl
+"""
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+import slo_report
+
+# Largest demand, in capacity steps, cheapest_mix() plans exactly
+MIX_MAX_STEPS = 20000
+
+
+def load_profiles(path):
+    # {instance type: profile} from a capacity profile file.
+    with open(path) as f:
+        return json.load(f)['types']
+
+
+def sustained_rps(profile, credit_mode='standard'):
+    # Request rate to plan on for one instance under sustained load.
+    if profile.get('burstable') and credit_mode == 'standard':
+        return profile['baseline_rps']
+    return profile['rps_at_target']
+
+
+def hourly_cost(profile, target_cpu, credit_mode='standard', surplus_credit_price=0.05):
+    """
+    Hourly cost of one instance running at `target_cpu` percent. Unlimited-mode burstable
+    instances also pay `surplus_credit_price` per vCPU-hour used above their baseline.
+    """
+    cost = profile['hourly_price']
+    if profile.get('burstable') and credit_mode == 'unlimited' and profile['rps_at_target'] > 0:
+        baseline_fraction = min(1.0, profile['baseline_rps'] / profile['rps_at_target'])
+        cost += profile['vcpus'] * target_cpu / 100 * (1 - baseline_fraction) * surplus_credit_price
+    return cost
+
+
+def cheapest_mix(demand_rps, profiles, max_count, target_cpu, credit_mode='standard', surplus_credit_price=0.05):
+    """
+    Cheapest {instance type: count} of at most `max_count` instances whose sustained capacity
+    covers `demand_rps`; ties go to fewer instances. If no mix within `max_count` covers the
+    demand, the mix with the most capacity is returned. Empty for no demand or no room.
+    Solved as a knapsack over instance count and capacity. Capacity is counted in steps
+    of the greatest common divisor of the types' rates (to 0.01 rps), which is exact for
+    the profile figures; above MIX_MAX_STEPS steps of demand the step is coarsened, with
+    rates rounded down so the chosen mix still covers the demand. The work is bounded by
+    max_count x MIX_MAX_STEPS x types however large the scale-out.
+    """
+    # Rates in hundredths of a request per second, rounded down
+    rates = {t: int(sustained_rps(profiles[t], credit_mode) * 100) for t in sorted(profiles)}
+    types = [t for t, rate in rates.items() if rate > 0]
+    if demand_rps <= 0 or max_count <= 0 or not types:
+        return {}
+    cost = np.array([hourly_cost(profiles[t], target_cpu, credit_mode, surplus_credit_price) for t in types])
+
+    largest = max(types, key=lambda t: (rates[t], -profiles[t]['hourly_price']))
+    demand = round(demand_rps * 100, 6)
+    if rates[largest] * max_count < demand:
+        return {largest: max_count}
+
+    step = math.gcd(*(rates[t] for t in types))
+    if demand / step > MIX_MAX_STEPS:
+        step = math.ceil(demand / MIX_MAX_STEPS)
+    target = math.ceil(demand / step)
+    units = [rates[t] // step for t in types]
+    # More instances than the smallest type needs on its own are never cheaper
+    max_count = min(max_count, math.ceil(target / max(min(units), 1)))
+
+    steps = np.arange(target + 1)
+    sources = np.array([np.maximum(steps - u, 0) for u in units])
+    # covering[u]: cheapest cost of `count` instances with at least u steps of capacity
+    covering = np.where(steps == 0, 0.0, np.inf)
+    choices = []
+    best_count, best_cost = None, np.inf
+    for count in range(1, max_count + 1):
+        candidates = covering[sources] + cost[:, None]
+        choice = candidates.argmin(axis=0)
+        covering = candidates[choice, steps]
+        choices.append(choice)
+        if round(covering[-1], 6) < round(best_cost, 6):
+            best_count, best_cost = count, covering[-1]
+
+    if best_count is None:
+        # Only reachable when coarse steps round every rate down too far; fall back to the largest type
+        return {largest: min(max_count, math.ceil(demand / rates[largest]))}
+    mix = {}
+    covered = target
+    for choice in reversed(choices[:best_count]):
+        index = choice[covered]
+        mix[types[index]] = mix.get(types[index], 0) + 1
+        covered = sources[index, covered]
+    return dict(sorted(mix.items()))
+
+
+def measured_rps(buckets, bucket_seconds, slo_p95_ms, slo_error_rate, stable=3):
+    """
+    Highest request rate held for `stable` consecutive buckets within the SLO: the
+    throughput one instance delivers before latency degrades.
+    """
+    best = 0.0
+    run = []
+    for bucket in buckets:
+        if bucket['requests'] and not slo_report.breaches_slo(bucket, slo_p95_ms, slo_error_rate):
+            run.append(bucket['requests'] / bucket_seconds)
+            if len(run) >= stable:
+                best = max(best, min(run[-stable:]))
+        else:
+            run = []
+    return best
+
+
+def measure(path, instance_type, timelines, soak_timelines, slo_p95_ms, slo_error_rate, soak_window):
+    # Update `instance_type` in the profile file at `path` from load-test timelines.
+    data = {'types': {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    profile = data['types'].setdefault(instance_type, {})
+
+    rates = []
+    for timeline in timelines:
+        header, buckets = slo_report.load_timeline(timeline)
+        rates.append(measured_rps(buckets, header['bucket_seconds'], slo_p95_ms, slo_error_rate))
+    profile['rps_at_target'] = round(max(rates), 3)
+
+    # The end of a long soak run, after CPU credits have run out, gives the baseline rate
+    if soak_timelines:
+        rates = []
+        for timeline in soak_timelines:
+            header, buckets = slo_report.load_timeline(timeline)
+            tail = [b for b in buckets if b['time'] >= buckets[-1]['time'] - soak_window]
+            rates.append(measured_rps(tail, header['bucket_seconds'], slo_p95_ms, slo_error_rate))
+        profile['baseline_rps'] = round(max(rates), 3)
+        profile['burstable'] = profile['baseline_rps'] < profile['rps_at_target']
+    else:
+        profile.setdefault('baseline_rps', profile['rps_at_target'])
+        profile.setdefault('burstable', False)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    return profile
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    measure_parser = subparsers.add_parser('measure', help="update an instance type's measured rates")
+    measure_parser.add_argument('instance_type')
+    measure_parser.add_argument('timelines', nargs='+', help="step/ramp timelines against one instance")
+    measure_parser.add_argument('--soak', nargs='*', default=[], help="long constant-load timelines")
+    measure_parser.add_argument('--soak-window', type=float, default=600, help="seconds at the end of a soak run to measure")
+    measure_parser.add_argument('--slo-p95-ms', type=float, default=1000.0)
+    measure_parser.add_argument('--slo-error-rate', type=float, default=0.01)
+    measure_parser.add_argument('--profiles', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'capacity_profiles.json'))
+    plan_parser = subparsers.add_parser('plan', help="show the cheapest mix for a demand")
+    plan_parser.add_argument('demand_rps', type=float)
+    plan_parser.add_argument('--max-count', type=int, default=4)
+    plan_parser.add_argument('--target-cpu', type=float, default=60)
+    plan_parser.add_argument('--credit-mode', choices=('standard', 'unlimited'), default='standard')
+    plan_parser.add_argument('--profiles', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'capacity_profiles.json'))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'measure':
+        profile = measure(args.profiles, args.instance_type, args.timelines, args.soak,
+                          args.slo_p95_ms, args.slo_error_rate, args.soak_window)
+        print(f"{args.instance_type}: {json.dumps(profile)}")
+    else:
+        profiles = load_profiles(args.profiles)
+        mix = cheapest_mix(args.demand_rps, profiles, args.max_count, args.target_cpu, args.credit_mode)
+        total = sum(sustained_rps(profiles[t], args.credit_mode) * n for t, n in mix.items())
+        cost = sum(hourly_cost(profiles[t], args.target_cpu, args.credit_mode) * n for t, n in mix.items())
+        print(f"{mix} covers {total:.2f} of {args.demand_rps:.2f} req/s for ${cost:.4f}/h")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,47 @@
-import boto3
-
-ec2 = boto3.client('ec2', region_name='eu-north-1')
-
-response = ec2.run_instances(
-    ImageId='ami-0c1ac8a41498c1a9c',
-    InstanceType='t3.micro',
-    KeyName='salamikey',
-    MinCount=1,
-    MaxCount=1,
-    SecurityGroupIds=['sg-0457955da20e50a9e'],
-    TagSpecifications=[
-        {
-            'ResourceType': 'instance',
-            'Tags': [{'Key': 'Purpose', 'Value': 'ManualTest'}]
-        }
-    ]
-)
-
-instance_id = response['Instances'][0]['InstanceId']
-
-print(f"Launched instance: {instance_id}")
+import argparse
+
+import boto3
+
+import autoscale
+import multi_group
+
+# Launch settings come from autoscale.py, or from one group of a multi_group.py config file,
+# so this script cannot drift from what the controller launches
+parser = argparse.ArgumentParser(description="Launch one manual test instance.")
+# Instance type to launch, e.g. `python ec2instancecreate.py t3.small` to profile it with the load-test suite
+parser.add_argument('instance_type', nargs='?')
+parser.add_argument('--config', help="multi_group.py config file to take the group's settings from")
+parser.add_argument('--group', help="group name in --config")
+args = parser.parse_args()
+
+settings = {name: getattr(autoscale, name) for name in ('region', 'ami_id', 'instance_type', 'key_name', 'security_group_id', 'subnet_id')}
+if args.config:
+    _, groups = multi_group.load_config(args.config)
+    group_settings = dict(groups).get(args.group)
+    if group_settings is None:
+        parser.error(f"--group must name a group in {args.config}")
+    settings.update({name: value for name, value in group_settings.items() if name in settings})
+
+ec2 = boto3.client('ec2', region_name=settings['region'])
+
+params = dict(
+    ImageId=settings['ami_id'],
+    InstanceType=args.instance_type or settings['instance_type'],
+    KeyName=settings['key_name'],
+    MinCount=1,
+    MaxCount=1,
+    SecurityGroupIds=[settings['security_group_id']],
+    TagSpecifications=[
+        {
+            'ResourceType': 'instance',
+            'Tags': [{'Key': 'Purpose', 'Value': 'ManualTest'}]
+        }
+    ]
+)
+if settings['subnet_id']:
+    params['SubnetId'] = settings['subnet_id']
+response = ec2.run_instances(**params)
+
+instance_id = response['Instances'][0]['InstanceId']
+
+print(f"Launched instance: {instance_id}")
@@ -0,0 +1,37 @@
+"""
+Cheap load forecasting for predictive scaling in autoscale.py.
+
+Holt's linear exponential smoothing (level + trend) over the controller's rolling
+metric history. Samples may be irregularly spaced (cron jitter, daemon intervals),
+so the trend is tracked per second and scaled by the actual gap between samples.
+"""
+import numpy as np
+
+
+def holt_forecast(timestamps, values, horizon, alpha=0.5, beta=0.3):
+    """
+    Forecast the value `horizon` seconds after the last sample.
+    Returns (forecast, one-step-ahead absolute errors over the history).
+    With a single sample the forecast is that sample and there are no errors.
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        raise ValueError("holt_forecast needs at least one sample")
+
+    gaps = np.diff(timestamps)
+    errors = np.empty(len(gaps))
+    level, trend = values[0], 0.0
+    for i, gap in enumerate(gaps):
+        gap = max(gap, 1.0)
+        predicted = level + trend * gap
+        errors[i] = abs(values[i + 1] - predicted)
+        new_level = predicted + alpha * (values[i + 1] - predicted)
+        trend = beta * (new_level - level) / gap + (1 - beta) * trend
+        level = new_level
+    return max(0.0, level + trend * horizon), errors
+
+
+def ewma(previous, sample, weight=0.3):
+    # Exponentially weighted moving average update; the first sample seeds the average.
+    return sample if previous is None else (1 - weight) * previous + weight * sample
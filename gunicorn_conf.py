@@ -0,0 +1,20 @@
+"""
+gunicorn settings for app.py: gunicorn -c gunicorn_conf.py app:app
+
+One worker process per vCPU so CPU-bound requests to / use every core, each with a
+pool of threads: a request to / holds its thread for 0.5 s of wall time, and the
+spare threads keep accepting /health while the cores are busy. APP_BIND,
+APP_WORKERS and APP_THREADS override the defaults.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("APP_BIND", "0.0.0.0:80")
+workers = int(os.environ.get("APP_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("APP_THREADS", 8))
+# Longer than the ALB health-check timeout, so a worker is only killed once it is truly stuck
+timeout = 30
+graceful_timeout = 20
+accesslog = None
+errorlog = "-"
@@ -0,0 +1,109 @@
+"""
+Load profiles for the Locust harness (locustfile.py).
+
+A profile is a list of stages (end second, users, spawn rate): from the end of the
+previous stage until `end`, Locust runs `users` users, spawning or stopping them at
+`spawn_rate` per second. Users send about one request per second each
+(constant_throughput(1) in locustfile.py), so users ~ requests per second.
+
+Profiles:
+- step: add `step_users` every `step_seconds`
+- ramp: linear ramp from `start` to `end` users
+- spike: steady base load with one short spike
+- diurnal: a day/night cosine cycle compressed into `period` seconds
+- replay: a JSON-lines request log (same format as simulator.py --requests),
+  replayed `speedup` times faster than real time
+
+Only the standard library is imported at load time, so the module loads in any Locust
+environment; the replay profile reads its log with log_analyzer.py, which needs NumPy.
+"""
+import math
+
+
+def step(base=5, step_users=10, step_seconds=300, steps=5, spawn_rate=5):
+    return [((i + 1) * step_seconds, base + i * step_users, spawn_rate) for i in range(steps)]
+
+
+def ramp(start=1, end=100, duration=1800, resolution=30, spawn_rate=10):
+    stages = []
+    for end_second in range(resolution, duration + 1, resolution):
+        stages.append((end_second, round(start + (end - start) * end_second / duration), spawn_rate))
+    return stages
+
+
+def spike(base=10, peak=150, before=600, spike_seconds=120, after=900, spawn_rate=50):
+    return [(before, base, spawn_rate),
+            (before + spike_seconds, peak, spawn_rate),
+            (before + spike_seconds + after, base, spawn_rate)]
+
+
+def diurnal(base=5, peak=80, period=3600, cycles=1, resolution=60, spawn_rate=10):
+    # Trough at the start of each cycle, peak halfway through.
+    stages = []
+    for end_second in range(resolution, period * cycles + 1, resolution):
+        phase = 2 * math.pi * end_second / period
+        stages.append((end_second, round(base + (peak - base) * (0.5 - 0.5 * math.cos(phase))), spawn_rate))
+    return stages
+
+
+def replay(path, speedup=10.0, max_users=500, spawn_rate=20):
+    """
+    Replay a JSON-lines request log, one record per line with a "timestamp" (ISO 8601 or
+    epoch seconds) and an optional "count". Each logged minute becomes one stage of
+    60 / speedup seconds whose user count matches that minute's request rate times `speedup`.
+    """
+    import log_analyzer  # needs NumPy, so only loaded for the replay profile
+    counts = {}
+    for seconds, count in log_analyzer.read_request_log(path):
+        minute = int(seconds // 60)
+        counts[minute] = counts.get(minute, 0) + count
+    if not counts:
+        raise ValueError(f"No timestamped request records found in {path}")
+
+    first = min(counts)
+    stages = []
+    for offset in range(max(counts) - first + 1):
+        users = min(max_users, math.ceil(counts.get(first + offset, 0) / 60 * speedup))
+        stages.append((round((offset + 1) * 60 / speedup, 3), users, spawn_rate))
+    return stages
+
+
+PROFILES = {
+    'step': step,
+    'ramp': ramp,
+    'spike': spike,
+    'diurnal': diurnal,
+    'replay': replay,
+}
+
+
+def build_profile(name, **params):
+    # Stages for the profile called `name`; `params` override its defaults.
+    try:
+        builder = PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown load profile {name!r}; choose from {', '.join(PROFILES)}") from None
+    return builder(**params)
+
+
+def stage_at(stages, run_time):
+    # (users, spawn_rate) for the stage covering `run_time` seconds, or None once the profile is over.
+    for end_second, users, spawn_rate in stages:
+        if run_time < end_second:
+            return users, spawn_rate
+    return None
+
+
+def parse_params(text):
+    # "key=value,key=value" (from LOAD_PROFILE_PARAMS) to keyword arguments; numbers are converted.
+    params = {}
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        key, _, value = item.partition('=')
+        try:
+            params[key.strip()] = int(value)
+        except ValueError:
+            try:
+                params[key.strip()] = float(value)
+            except ValueError:
+                params[key.strip()] = value.strip()
+    return params
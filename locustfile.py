@@ -1,8 +1,83 @@
-from locust import HttpUser, task, between #importations
+from locust import HttpUser, LoadTestShape, constant_throughput, events, task #importations
+import json
+import os
+import threading
+import time
+
+import load_profiles
+import slo_report
+
+# Load profile (see load_profiles.py), e.g.
+#   LOAD_PROFILE=spike LOAD_PROFILE_PARAMS="peak=200" locust -f locustfile.py --headless --host http://<alb-dns>
+# Without LOAD_PROFILE the run is driven by --users/--spawn-rate as before.
+load_profile = os.environ.get('LOAD_PROFILE')
+load_profile_params = os.environ.get('LOAD_PROFILE_PARAMS', '')
+
+# Latency and errors are bucketed per BUCKET_SECONDS and written as a timeline for
+# slo_report.py when the test stops (run single-process; each distributed worker writes its own)
+BUCKET_SECONDS = 10
+results_dir = os.environ.get('LOADTEST_RESULTS_DIR', 'loadtest_results')
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_started = None
+_environment = None
+
 
 class WebsiteUser(HttpUser):
-    wait_time = between(0, 0)
+    # About one request per second per user, so a profile's user count is its request rate
+    wait_time = constant_throughput(1)
+
+    @task(3)
+    def burn_cpu(self):
+        self.client.get("/")
 
-    @task
+    @task(1)
     def hit_homepage(self):
         self.client.get("/health")
+
+
+if load_profile:
+    class ProfileShape(LoadTestShape):
+        stages = load_profiles.build_profile(load_profile, **load_profiles.parse_params(load_profile_params))
+
+        def tick(self):
+            return load_profiles.stage_at(self.stages, self.get_run_time())
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    global _started, _environment
+    _started = time.time()
+    _environment = environment
+    _buckets.clear()
+
+
+@events.request.add_listener
+def on_request(response_time, exception, **kwargs):
+    bucket = int(time.time() // BUCKET_SECONDS) * BUCKET_SECONDS
+    with _buckets_lock:
+        if bucket not in _buckets:
+            runner = _environment.runner if _environment else None
+            _buckets[bucket] = [[], 0, runner.user_count if runner else None]
+        entry = _buckets[bucket]
+        entry[0].append(response_time)
+        if exception is not None:
+            entry[1] += 1
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if _started is None:
+        return
+    scenario = load_profile or 'manual'
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{scenario}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(_started))}.jsonl")
+    with _buckets_lock:
+        buckets = sorted(_buckets.items())
+    with open(path, 'w') as f:
+        f.write(json.dumps({'scenario': scenario, 'params': load_profile_params,
+                            'started': _started, 'bucket_seconds': BUCKET_SECONDS}) + "\n")
+        for start, (response_times, failures, users) in buckets:
+            f.write(json.dumps(slo_report.summarize_bucket(start, response_times, failures, users)) + "\n")
+    print(f"Load-test timeline written to {path}")
@@ -0,0 +1,418 @@
+"""
+Streaming analyzer for autoscale.py logs.
+
+Parses autoscale.log and its rotated files (autoscale.log.1, autoscale.log.2.gz,
+autoscale.log.2025-08-03, ...) line by line, oldest first, into a columnar dataset:
+one binary file per column, appended in chunks, so parsing months of logs runs in
+constant memory and the dataset loads with np.fromfile(). Two tables are written:
+- ticks: time, group, running, avg_cpu, data_lag, action, pending, draining
+- events: time, group, kind, value (scale-up triggers, scale-downs, instances
+  becoming healthy with their request-to-healthy seconds, failed launches)
+Lines from multi_group.py carry a "[group] " prefix; plain logs are group "".
+parse_line(), the event patterns and read_request_log() are also what slo_report.py,
+simulator.py and load_profiles.py read controller and request logs with.
+
+The report covers decision lag (tick time minus the newest CPU datapoint used),
+trigger-to-healthy time, flapping (scale actions reversed within --flap-window)
+and the CPU distribution per fleet size. Building again only appends data newer
+than what the dataset holds; tail mode follows the live log, across rotations,
+and prints a line per tick.
+
+Examples:
+    python log_analyzer.py build autoscale.log* --dataset log_dataset
+    python log_analyzer.py report --dataset log_dataset
+    python log_analyzer.py tail autoscale.log --dataset log_dataset
+"""
+import argparse
+import ast
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+LOG_LINE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) - \w+ - (?:\[([^\]]+)\] )?(.*)$')
+INSTANCE_CPU = re.compile(r'^Instance \S+ - Timestamp \(UK\): (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d), Avg CPU: ')
+# Older controllers logged one instance per action and no request-to-healthy time:
+# "SCALE UP triggered. Checking ...", "SCALE DOWN: Stopping i-...", "Instance i-... is healthy and ready."
+SCALE_UP = re.compile(r'^SCALE UP triggered(?: for (\d+) instance|\. )')
+SCALE_DOWN = re.compile(r'^SCALE DOWN: (?:Draining|Stopping) (\[.*\]|\S+)$')
+HEALTHY = re.compile(r'^Instance \S+ is healthy and ready(?: after (\d+)s|\.$)')
+FAILED = re.compile(r'^(?:Instance \S+ failed health checks|Timeout waiting for instance \S+ to become healthy)')
+
+TICK_COLUMNS = {'time': '<f8', 'group': '<i4', 'running': '<i4', 'avg_cpu': '<f8', 'data_lag': '<f8',
+                'action': '<i4', 'pending': '<i4', 'draining': '<i4'}
+EVENT_COLUMNS = {'time': '<f8', 'group': '<i4', 'kind': '<i4', 'value': '<f8'}
+EVENT_SCALE_UP = 1
+EVENT_SCALE_DOWN = 2
+EVENT_HEALTHY = 3
+EVENT_FAILED = 4
+
+CHUNK_ROWS = 4096
+uk_tz = pytz.timezone("Europe/London")
+log_tz = uk_tz  # timezone of the controller host's log timestamps (--log-timezone)
+
+
+def parse_line(line):
+    # (timestamp, group name or '', message) of a controller log line, or None for any other line.
+    match = LOG_LINE.match(line.rstrip('\n'))
+    if not match:
+        return None
+    timestamp, group_name, message = match.groups()
+    return timestamp, group_name or '', message
+
+
+def read_request_log(path):
+    """
+    Yield (epoch seconds, request count) for every timestamped record of a JSON-lines request
+    log: one record per line with a "timestamp" (or "time"; ISO 8601 or epoch seconds) and an
+    optional "count" (default 1).
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            timestamp = record.get('timestamp', record.get('time'))
+            if timestamp is None:
+                continue
+            if isinstance(timestamp, str):
+                seconds = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+            else:
+                seconds = float(timestamp)
+            yield seconds, float(record.get('count', 1))
+
+
+def ordered_log_files(paths):
+    # Oldest first: numbered rotations from the highest number down, dated ones by date, the live file last.
+    def key(path):
+        name = os.path.basename(path)
+        suffix = name.split('.log', 1)[1].lstrip('.') if '.log' in name else ''
+        suffix = suffix[:-3] if suffix.endswith('.gz') else suffix
+        if not suffix:
+            return (2, 0, '')
+        if suffix.isdigit():
+            return (0, -int(suffix), '')
+        return (1, 0, suffix)
+    return sorted(paths, key=key)
+
+
+def open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', errors='replace')
+    return open(path, errors='replace')
+
+
+class Dataset:
+    """
+    Column files of the ticks and events tables in `directory`, with appended rows
+    buffered and flushed every CHUNK_ROWS rows. meta.json holds group names and, per
+    table and group, the time of the newest row and how many rows share that time, so
+    later builds only append newer data without dropping same-second rows.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, 'meta.json')
+        try:
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        except FileNotFoundError:
+            self.meta = {'groups': [], 'last_time': {}, 'last_count': {}, 'tail': {}}
+        self.meta['timezone'] = log_tz.zone
+        self.meta.setdefault('last_count', {})
+        # Watermark as loaded: {table:group: (time, rows at that time)}. Datasets written before
+        # last_count was kept count every row at their newest time as stored.
+        self.watermark = {key: (t, self.meta['last_count'].get(key, float('inf')))
+                          for key, t in self.meta['last_time'].items()}
+        self.seen_at_watermark = {}
+        self.buffers = {'ticks': {c: [] for c in TICK_COLUMNS}, 'events': {c: [] for c in EVENT_COLUMNS}}
+
+    def group_code(self, name):
+        if name not in self.meta['groups']:
+            self.meta['groups'].append(name)
+        return self.meta['groups'].index(name)
+
+    def is_new(self, table, group, timestamp):
+        # Rows at the watermark time are skipped only as often as the dataset already holds them
+        key = f"{table}:{group}"
+        last_time, last_count = self.watermark.get(key, (float('-inf'), 0))
+        if timestamp != last_time:
+            return timestamp > last_time
+        seen = self.seen_at_watermark.get(key, 0) + 1
+        self.seen_at_watermark[key] = seen
+        return seen > last_count
+
+    def append(self, table, row):
+        buffers = self.buffers[table]
+        for column, values in buffers.items():
+            values.append(row[column])
+        key = f"{table}:{row['group']}"
+        same_time = self.meta['last_time'].get(key) == row['time']
+        self.meta['last_count'][key] = self.meta['last_count'].get(key, 0) + 1 if same_time else 1
+        self.meta['last_time'][key] = row['time']
+        if len(buffers['time']) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        for table, columns in (('ticks', TICK_COLUMNS), ('events', EVENT_COLUMNS)):
+            buffers = self.buffers[table]
+            if not buffers['time']:
+                continue
+            for column, dtype in columns.items():
+                with open(os.path.join(self.directory, f"{table}.{column}"), 'ab') as f:
+                    np.asarray(buffers[column], dtype=dtype).tofile(f)
+                buffers[column].clear()
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+
+def load_table(directory, table):
+    # {column: array} for a table of a dataset written by Dataset.
+    columns = TICK_COLUMNS if table == 'ticks' else EVENT_COLUMNS
+    result = {}
+    for column, dtype in columns.items():
+        path = os.path.join(directory, f"{table}.{column}")
+        result[column] = np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.empty(0, dtype=dtype)
+    return result
+
+
+class LogParser:
+    """
+    Turns log lines into tick rows and events in a Dataset. A tick opens at
+    "All running instances" and closes at the dashboard line (or the group's next tick).
+    `on_tick` is called with every tick row written.
+    """
+
+    def __init__(self, dataset, on_tick=None):
+        self.dataset = dataset
+        self.on_tick = on_tick
+        self.open_ticks = {}
+
+    def feed(self, line):
+        parsed = parse_line(line)
+        if parsed is None:
+            return
+        timestamp, group_name, message = parsed
+        group = self.dataset.group_code(group_name)
+        tick = self.open_ticks.get(group)
+
+        if message.startswith('All running instances: '):
+            self.close(group)
+            self.open_ticks[group] = {
+                'time': _epoch(timestamp), 'group': group, 'avg_cpu': np.nan, 'newest_data': None,
+                'running': len(ast.literal_eval(message[len('All running instances: '):])),
+                'action': 0, 'pending': 0, 'draining': 0,
+            }
+            return
+        if message.startswith('CloudWatch dashboard '):
+            self.close(group)
+            return
+
+        event = None
+        if (cpu := INSTANCE_CPU.match(message)) and tick is not None:
+            data_time = uk_tz.localize(datetime.strptime(cpu.group(1), '%Y-%m-%d %H:%M:%S')).timestamp()
+            tick['newest_data'] = max(tick['newest_data'] or data_time, data_time)
+        elif message.startswith('Overall average CPU utilization: ') and tick is not None:
+            tick['avg_cpu'] = float(message[len('Overall average CPU utilization: '):].rstrip('%'))
+        elif message.startswith('Pending launches: ') and tick is not None:
+            tick['pending'] = len(ast.literal_eval(message[len('Pending launches: '):]))
+        elif message.startswith('Draining: ') and tick is not None:
+            tick['draining'] = len(ast.literal_eval(message[len('Draining: '):]))
+        elif scale_up := SCALE_UP.match(message):
+            count = int(scale_up.group(1) or 1)
+            event = (EVENT_SCALE_UP, count)
+            if tick is not None:
+                tick['action'] = count
+        elif scale_down := SCALE_DOWN.match(message):
+            # A drained scale-in logs "Draining" when decided and "Stopping" ticks later, outside any
+            # tick; older logs stop directly within the tick
+            if message.startswith('SCALE DOWN: Draining') or (tick is not None and tick['action'] == 0):
+                stopped = scale_down.group(1)
+                count = len(ast.literal_eval(stopped)) if stopped.startswith('[') else 1
+                event = (EVENT_SCALE_DOWN, count)
+                if tick is not None:
+                    tick['action'] = -count
+        elif healthy := HEALTHY.match(message):
+            event = (EVENT_HEALTHY, float(healthy.group(1)) if healthy.group(1) else np.nan)
+        elif FAILED.match(message):
+            event = (EVENT_FAILED, 0.0)
+
+        if event is not None:
+            event_time = _epoch(timestamp)
+            if self.dataset.is_new('events', group, event_time):
+                self.dataset.append('events', {'time': event_time, 'group': group, 'kind': event[0], 'value': event[1]})
+
+    def close(self, group):
+        tick = self.open_ticks.pop(group, None)
+        if tick is None or not self.dataset.is_new('ticks', group, tick['time']):
+            return
+        tick['data_lag'] = tick['time'] - tick['newest_data'] if tick['newest_data'] is not None else np.nan
+        self.dataset.append('ticks', tick)
+        if self.on_tick:
+            self.on_tick(tick)
+
+    def close_all(self):
+        for group in list(self.open_ticks):
+            self.close(group)
+
+
+def _epoch(timestamp):
+    # Log timestamps are the controller host's local time.
+    return log_tz.localize(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')).timestamp()
+
+
+def build(paths, directory):
+    dataset = Dataset(directory)
+    parser = LogParser(dataset)
+    for path in ordered_log_files(paths):
+        with open_log(path) as f:
+            for line in f:
+                parser.feed(line)
+    parser.close_all()
+    dataset.flush()
+    return dataset
+
+
+def tail(path, directory, poll=2.0, stop=None):
+    """
+    Follow `path` like tail -F: new lines are parsed into the dataset as they are written,
+    and a rotated or truncated file is reopened from the start. Runs until `stop` is set.
+    """
+    dataset = Dataset(directory)
+
+    def on_tick(tick):
+        groups = dataset.meta['groups']
+        lag = f"{tick['data_lag']:.0f}s" if not np.isnan(tick['data_lag']) else "n/a"
+        label = f"[{groups[tick['group']]}] " if groups[tick['group']] else ""
+        print(f"{datetime.fromtimestamp(tick['time'], log_tz):%Y-%m-%d %H:%M:%S} {label}running {tick['running']} "
+              f"cpu {tick['avg_cpu']:.1f}% lag {lag} action {tick['action']:+d} pending {tick['pending']}", flush=True)
+        dataset.flush()
+
+    parser = LogParser(dataset, on_tick)
+    position = dataset.meta['tail'].get(os.path.abspath(path), {})
+    f, inode = None, None
+    while stop is None or not stop.is_set():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            time.sleep(poll)
+            continue
+        if f is None or stat.st_ino != inode or stat.st_size < f.tell():
+            if f is not None:
+                f.close()
+            f, inode = open(path, errors='replace'), stat.st_ino
+            if position.get('inode') == inode and position.get('offset', 0) <= stat.st_size:
+                f.seek(position['offset'])
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith('\n'):
+                # Partial line still being written; read it again next poll
+                f.seek(offset)
+                break
+            parser.feed(line)
+        position = {'inode': inode, 'offset': f.tell()}
+        dataset.meta['tail'][os.path.abspath(path)] = position
+        time.sleep(poll)
+    if f is not None:
+        f.close()
+    dataset.flush()
+
+
+def report(directory, flap_window=1800.0):
+    ticks = load_table(directory, 'ticks')
+    events = load_table(directory, 'events')
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    groups, tz = meta['groups'], pytz.timezone(meta.get('timezone', 'Europe/London'))
+
+    lines = []
+    for code, name in enumerate(groups):
+        t = {c: v[ticks['group'] == code] for c, v in ticks.items()}
+        e = {c: v[events['group'] == code] for c, v in events.items()}
+        if not len(t['time']):
+            continue
+        span_days = max((t['time'].max() - t['time'].min()) / 86400, 1 / 24)
+        lines.append(f"Group {name or '(default)'}: {len(t['time'])} ticks from "
+                     f"{datetime.fromtimestamp(t['time'].min(), tz):%Y-%m-%d %H:%M} to {datetime.fromtimestamp(t['time'].max(), tz):%Y-%m-%d %H:%M}")
+
+        lag = t['data_lag'][~np.isnan(t['data_lag'])]
+        if len(lag):
+            lines.append(f"  decision lag (tick - newest datapoint): p50 {np.percentile(lag, 50):.0f}s, "
+                         f"p95 {np.percentile(lag, 95):.0f}s, max {lag.max():.0f}s")
+
+        healthy = e['value'][e['kind'] == EVENT_HEALTHY]
+        timed = healthy[~np.isnan(healthy)]  # older logs don't record the request-to-healthy time
+        triggers = int((e['kind'] == EVENT_SCALE_UP).sum())
+        failed = int((e['kind'] == EVENT_FAILED).sum())
+        if len(timed):
+            lines.append(f"  trigger to healthy: {len(healthy)} instances, p50 {np.percentile(timed, 50):.0f}s, "
+                         f"p95 {np.percentile(timed, 95):.0f}s, max {timed.max():.0f}s; {failed} failed")
+        elif len(healthy):
+            lines.append(f"  trigger to healthy: {len(healthy)} instances (no timings logged); {failed} failed")
+        lines.append(f"  scale actions: {triggers} up, {int((e['kind'] == EVENT_SCALE_DOWN).sum())} down")
+
+        # A flap is an action reversed by the opposite one within flap_window
+        actions = np.flatnonzero(t['action'])
+        directions = np.sign(t['action'][actions])
+        times = t['time'][actions]
+        reversals = (directions[1:] != directions[:-1]) & (np.diff(times) <= flap_window)
+        lines.append(f"  flapping: {int(reversals.sum())} reversals within {flap_window:.0f}s "
+                     f"({reversals.sum() / span_days:.2f}/day)")
+
+        lines.append("  CPU per fleet size:   ticks    mean     p10     p50     p90")
+        for size in np.unique(t['running']):
+            cpu = t['avg_cpu'][(t['running'] == size) & ~np.isnan(t['avg_cpu'])]
+            if len(cpu):
+                p10, p50, p90 = np.percentile(cpu, [10, 50, 90])
+                lines.append(f"    {size:>4} instances    {len(cpu):>6} {cpu.mean():>7.1f} {p10:>7.1f} {p50:>7.1f} {p90:>7.1f}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="parse logs (and rotated files) into the dataset")
+    build_parser.add_argument('logs', nargs='+')
+    tail_parser = subparsers.add_parser('tail', help="follow the live log into the dataset")
+    tail_parser.add_argument('log')
+    tail_parser.add_argument('--poll', type=float, default=2.0)
+    report_parser = subparsers.add_parser('report', help="summarize the dataset")
+    report_parser.add_argument('--flap-window', type=float, default=1800.0)
+    for sub in (build_parser, tail_parser, report_parser):
+        sub.add_argument('--dataset', default='log_dataset')
+    for sub in (build_parser, tail_parser):
+        sub.add_argument('--log-timezone', default='Europe/London', help="timezone the controller host logs in")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global log_tz
+    args = parse_args(argv)
+    if args.command != 'report':
+        log_tz = pytz.timezone(args.log_timezone)
+    if args.command == 'build':
+        build(args.logs, args.dataset)
+        print(report(args.dataset))
+    elif args.command == 'tail':
+        try:
+            tail(args.log, args.dataset, args.poll)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(report(args.dataset, args.flap_window))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Local time-series store for autoscale.py.
+
+A small SQLite file keeps the last `retention` seconds of every metric series the
+controller fetches (one row per datapoint, trimmed each tick like a ring buffer),
+how far each series has already been fetched, and the controller's recent scaling
+actions. With it a tick only asks CloudWatch for data newer than what is stored,
+and cooldowns can be enforced without any extra API calls. Timestamps are epoch
+seconds.
+"""
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datapoints (
+    series TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    series TEXT PRIMARY KEY,
+    fetched_until REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS actions (
+    ts REAL NOT NULL,
+    action TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS actions_by_type ON actions (action, ts);
+"""
+
+
+def open_store(path):
+    # Open (creating if needed) the store at `path`. Callers serialise access, possibly from different threads.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def fetched_until(conn, series_keys):
+    # {series: end of the last fetch covering it}; series never fetched are absent.
+    keys = list(series_keys)
+    result = {}
+    for offset in range(0, len(keys), 500):
+        chunk = keys[offset:offset + 500]
+        rows = conn.execute(
+            f"SELECT series, fetched_until FROM series WHERE series IN ({','.join('?' * len(chunk))})", chunk)
+        result.update(rows)
+    return result
+
+
+def add_points(conn, points, series_keys, until):
+    """
+    Store `points` ({series: [(ts, value), ...]}) and mark every series in `series_keys`
+    as fetched up to `until`. Re-fetched datapoints replace the stored ones, so late
+    CloudWatch data corrects earlier partial values.
+    """
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO datapoints (series, ts, value) VALUES (?, ?, ?)",
+                         ((series, ts, value) for series, rows in points.items() for ts, value in rows))
+        conn.executemany("INSERT OR REPLACE INTO series (series, fetched_until) VALUES (?, ?)",
+                         ((series, until) for series in series_keys))
+
+
+def window(conn, series_keys, start, end):
+    # {series: [(ts, value), ...]} for datapoints with start <= ts <= end, oldest first.
+    keys = list(series_keys)
+    result = {series: [] for series in keys}
+    for offset in range(0, len(keys), 500):
+        chunk = keys[offset:offset + 500]
+        rows = conn.execute(
+            f"SELECT series, ts, value FROM datapoints WHERE series IN ({','.join('?' * len(chunk))}) "
+            "AND ts >= ? AND ts <= ? ORDER BY series, ts", chunk + [start, end])
+        for series, ts, value in rows:
+            result[series].append((ts, value))
+    return result
+
+
+def trim(conn, before):
+    # Drop datapoints and actions older than `before`, and series not fetched since.
+    with conn:
+        conn.execute("DELETE FROM datapoints WHERE ts < ?", (before,))
+        conn.execute("DELETE FROM series WHERE fetched_until < ?", (before,))
+        conn.execute("DELETE FROM actions WHERE ts < ?", (before,))
+
+
+def record_action(conn, ts, action, count):
+    # Remember a scaling action ('scale_up' or 'scale_down') of `count` instances.
+    with conn:
+        conn.execute("INSERT INTO actions (ts, action, count) VALUES (?, ?, ?)", (ts, action, count))
+
+
+def last_action(conn, actions=None):
+    # Timestamp of the most recent action (of one of `actions`, if given), or None.
+    if actions is None:
+        row = conn.execute("SELECT MAX(ts) FROM actions").fetchone()
+    else:
+        actions = list(actions)
+        row = conn.execute(f"SELECT MAX(ts) FROM actions WHERE action IN ({','.join('?' * len(actions))})",
+                           actions).fetchone()
+    return row[0]
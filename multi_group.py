@@ -0,0 +1,219 @@
+"""
+Run the autoscale.py controller for many scaling groups, across regions, from one process.
+
+The config file (JSON, see groups.example.json) holds settings shared by every group
+under "defaults" and one entry per group under "groups". Setting names are the
+module-level settings of autoscale.py (target_group_arn, ami_id, security_group_id,
+sns_topic_arn, thresholds, ...); a group's entry overrides the defaults, which
+override autoscale.py's own values. Unknown names are rejected. Settings derived from
+others (user data from app_server, metric sources from the latency objectives,
+inventory filters from security_group_id) are built when used, so they follow a
+group's overrides; a group's instances are tagged with its name unless it sets
+group_tag_value.
+
+Each group gets its own copy of the autoscale module, so its settings, caches and
+state are independent; its state files live under <state_dir>/<name>/. AWS clients
+are created once per region and shared by the groups in it (boto3 clients are
+thread-safe). Every tick, each group's tick runs on a thread pool; a group whose
+previous tick is still running is skipped for that tick instead of delaying the
+others.
+
+Usage: python multi_group.py --config groups.json [--interval 180] [--workers 8] [--once]
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import boto3
+from botocore.config import Config
+
+import alerts
+import tracing
+
+logger = logging.getLogger(__name__)
+
+AUTOSCALE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'autoscale.py')
+
+# Per-group state files, placed under <state_dir>/<group name>/ unless a group sets them explicitly
+STATE_FILES = {
+    'pending_launches_file': 'pending_launches.json',
+    'pending_drains_file': 'pending_drains.json',
+    'history_file': 'metric_history.json',
+    'provision_log_file': 'provision_latency.jsonl',
+    'dashboard_hash_file': 'dashboard.sha256',
+    'alert_state_file': 'alert_state.json',
+    'trace_file': 'tick_trace.jsonl',
+    'metric_store_file': 'metric_store.sqlite',
+    'target_tracking_state_file': 'target_tracking.json',
+}
+
+CLIENT_NAMES = ('cloudwatch', 'ec2', 'sns', 'elbv2')
+
+shutdown_event = threading.Event()
+
+
+class GroupLogger(logging.LoggerAdapter):
+    # Prefix a group's log lines with its name.
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['group']}] {msg}", kwargs
+
+
+def load_config(path):
+    """
+    Read the config file and return (options, [(group name, settings), ...]), with each
+    group's settings merged over the defaults.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    defaults = config.get('defaults', {})
+    groups = []
+    names = set()
+    for entry in config['groups']:
+        entry = dict(entry)
+        name = entry.pop('name')
+        if name in names:
+            raise ValueError(f"Duplicate group name {name!r} in {path}")
+        names.add(name)
+        groups.append((name, {**defaults, **entry}))
+    options = {key: value for key, value in config.items() if key not in ('defaults', 'groups')}
+    return options, groups
+
+
+def create_region_clients(region, pool_size):
+    # One session and one set of instrumented clients per region, sized for the groups sharing them.
+    session = boto3.session.Session(region_name=region)
+    client_config = Config(tcp_keepalive=True, max_pool_connections=max(10, pool_size))
+    clients = {name: session.client(name, config=client_config) for name in CLIENT_NAMES}
+    for client in clients.values():
+        tracing.instrument_client(client)
+    return clients
+
+
+def load_group(name, settings, clients, state_dir):
+    """
+    Load a private copy of autoscale.py for group `name`, apply its settings and
+    per-group state paths, and point it at the shared clients of its region.
+    """
+    spec = importlib.util.spec_from_file_location(f"autoscale.{name}", AUTOSCALE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    group_dir = os.path.join(state_dir, name)
+    os.makedirs(group_dir, exist_ok=True)
+    for setting, filename in STATE_FILES.items():
+        setattr(module, setting, os.path.join(group_dir, filename))
+    module.alert_subject_prefix = f"[{name}] "
+    module.group_tag_value = name
+    module.metrics_namespace = f"AutoScalingMonitoring/{name}"
+    module.dashboard_name = f"AutoScalingMonitoring-{name}"
+    module.drain_alerts_each_tick = False
+
+    for setting, value in settings.items():
+        if setting.startswith('_') or not hasattr(module, setting) or callable(getattr(module, setting)):
+            raise ValueError(f"Unknown setting {setting!r} for group {name}")
+        setattr(module, setting, value)
+
+    for client_name, client in clients.items():
+        setattr(module, client_name, client)
+    module.logger = GroupLogger(module.logger, {'group': name})
+    return module
+
+
+def load_groups(config_path, state_dir=None):
+    # {group name: autoscale module copy} for every group in the config file, plus the config options.
+    options, groups = load_config(config_path)
+    state_dir = state_dir or options.get('state_dir') or os.path.join(os.path.dirname(os.path.abspath(config_path)), 'groups_state')
+
+    regions = {}
+    for _, settings in groups:
+        region = settings.setdefault('region', 'eu-north-1')
+        regions[region] = regions.get(region, 0) + 1
+    clients = {region: create_region_clients(region, count) for region, count in regions.items()}
+
+    modules = {}
+    for name, settings in groups:
+        modules[name] = load_group(name, settings, clients[settings['region']], state_dir)
+        logger.info(f"Loaded scaling group {name} ({settings['region']}, {modules[name].target_group_arn}).")
+    return modules, options
+
+
+def tick_group(name, module):
+    # One tick of one group; failures are logged and never reach the other groups.
+    started = time.monotonic()
+    try:
+        module.main()
+    except Exception:
+        module.logger.exception("Autoscaler tick failed.")
+    return time.monotonic() - started
+
+
+def handle_shutdown(signum, frame):
+    logger.info(f"Received signal {signal.Signals(signum).name}. Shutting down after current ticks.")
+    shutdown_event.set()
+
+
+def run(modules, interval, workers, once=False, drain_timeout=10):
+    """
+    Tick every group every `interval` seconds on a pool of `workers` threads. A group whose
+    previous tick has not finished is skipped (and logged) rather than queued.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='group')
+    in_flight = {}
+    started_at = {}
+    logger.info(f"Managing {len(modules)} scaling groups with {workers} workers, {interval}s tick interval.")
+    while not shutdown_event.is_set():
+        tick_started = time.monotonic()
+        for name, module in modules.items():
+            future = in_flight.get(name)
+            if future is not None and not future.done():
+                logger.warning(f"Group {name} is still running a tick started {tick_started - started_at[name]:.0f}s ago; skipping it this tick.")
+                continue
+            started_at[name] = tick_started
+            in_flight[name] = executor.submit(tick_group, name, module)
+        if once:
+            wait(in_flight.values())
+            break
+        shutdown_event.wait(max(0.0, interval - (time.monotonic() - tick_started)))
+
+    # Let in-flight ticks finish, then publish held-back alerts and persist each group's alert state
+    wait(in_flight.values(), timeout=max(interval, 60))
+    alerts.flush_all(drain_timeout)
+    for module in modules.values():
+        module.save_json_state(module.alert_state_file, alerts.snapshot(module.alert_subject_prefix))
+    executor.shutdown(wait=False)
+    logger.info("Multi-group autoscaler stopped.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', required=True, help="JSON config file with defaults and groups")
+    parser.add_argument('--interval', type=float, help="seconds between ticks (default: config 'interval' or 180)")
+    parser.add_argument('--workers', type=int, help="concurrent group ticks (default: config 'workers' or one per group, up to 32)")
+    parser.add_argument('--state-dir', help="directory for per-group state (default: config 'state_dir' or groups_state/)")
+    parser.add_argument('--once', action='store_true', help="run a single tick of every group and exit")
+    args = parser.parse_args(argv)
+    if args.interval is not None and args.interval <= 0:
+        parser.error("--interval must be positive")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    modules, options = load_groups(args.config, args.state_dir)
+    interval = args.interval or options.get('interval', 180)
+    workers = args.workers or options.get('workers') or min(32, len(modules))
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+    run(modules, interval, workers, args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Multi-metric scaling policy engine for autoscale.py.
+
+A metric source describes one scaling signal: a per-instance metric (CPU, memory
+from the CloudWatch agent) averaged over the fleet, or a target-group metric from
+the ALB (RequestCountPerTarget, TargetResponseTime). Every source has a target
+value, the level that counts as "as busy as we want to be". Each source's value
+is converted to a CPU-equivalent load, value / target * scale_up_target_cpu, so
+the existing threshold and proportional rules in scaling_decision() apply to any
+metric. Latency sources also have a floor, the latency of an idle fleet (the
+requests' own service time); only latency above it counts as load,
+(value - floor) / (target - floor) * scale_up_target_cpu, so an idle fleet reads
+as unloaded and a tail-latency objective (ALB TargetResponseTime p95/p99, an
+extended statistic) scales out as soon as requests start queueing. The per-source
+loads are then combined into one load by a rule:
+- 'max': the most demanding source wins (scale out if any signal is high,
+  scale in only when all are low)
+- 'weighted': weighted mean of the sources' loads
+A scale-out-only source (scale_in=False) takes part in the combination only while its
+load is above the target: it can call for more capacity, but a value at or below its
+target never holds off scale-in. Memory is one: an instance's resident memory does not
+move to the rest of the fleet when instances are removed, so it says nothing about how
+many instances the load needs.
+"""
+
+INSTANCE_SCOPE = 'instance'
+ALB_SCOPE = 'alb'
+
+
+def instance_source(name, namespace, metric_name, target=None, weight=1.0, scale_in=True):
+    """
+    Per-instance metric averaged over the fleet. A `target` of None means the metric is
+    already on the CPU scale (percent busy) and is used unchanged.
+    """
+    return {'name': name, 'scope': INSTANCE_SCOPE, 'namespace': namespace, 'metric': metric_name,
+            'stat': 'Average', 'target': target, 'floor': 0.0, 'weight': weight, 'scale_in': scale_in}
+
+
+def alb_source(name, metric_name, stat, target, weight=1.0, floor=0.0, scale_in=True):
+    # Target-group metric from the ALB; `name` doubles as the GetMetricData query ID. `stat` may be e.g. 'p95'.
+    return {'name': name, 'scope': ALB_SCOPE, 'metric': metric_name,
+            'stat': stat, 'target': target, 'floor': floor, 'weight': weight, 'scale_in': scale_in}
+
+
+def latency_source(name, stat, target, floor, weight=1.0):
+    # ALB TargetResponseTime percentile (seconds) against the latency objective `target`.
+    if target <= floor:
+        raise ValueError(f"Latency objective for {name!r} must be above its floor")
+    return alb_source(name, 'TargetResponseTime', stat, target, weight, floor)
+
+
+def source_loads(sources, values, target_cpu):
+    # Convert each source's measured value to a CPU-equivalent load in percent.
+    loads = {}
+    for source in sources:
+        value = values[source['name']]
+        if source['target'] is None:
+            loads[source['name']] = value
+        else:
+            loads[source['name']] = max(0.0, value - source['floor']) / (source['target'] - source['floor']) * target_cpu
+    return loads
+
+
+def combine_loads(sources, loads, rule='max', target_cpu=None):
+    """
+    Combine per-source loads into the single load the scaling decision is made on. With
+    `target_cpu`, scale-out-only sources count only while their load is above it.
+    """
+    sources = [source for source in sources
+               if source['scale_in'] or target_cpu is None or loads[source['name']] > target_cpu]
+    if not sources:
+        return 0.0
+    if rule == 'max':
+        return max(loads[source['name']] for source in sources)
+    if rule == 'weighted':
+        total_weight = sum(source['weight'] for source in sources)
+        return sum(loads[source['name']] * source['weight'] for source in sources) / total_weight
+    raise ValueError(f"Unknown policy combine rule: {rule!r}")
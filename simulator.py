@@ -0,0 +1,233 @@
+"""
+Offline trace-replay simulator for the autoscale.py scaling policy.
+
+Replays a CPU demand trace minute by minute against an in-process model of the
+fleet (boot and health-check delays, 5-minute trailing CPU average, primary
+instance that is never stopped) and evaluates autoscale.scaling_decision() for
+every combination of policy parameters at once with NumPy.
+
+Demand is expressed in "instance-percent": 100 is one instance fully busy.
+Traces can come from:
+- an autoscale.log file (fleet average CPU x running instances at each tick)
+- a JSON-lines request log, one record per line with a "timestamp" (ISO 8601
+  or epoch seconds) and an optional "count" of requests
+- a synthetic diurnal trace with random spikes
+
+Example:
+    python simulator.py --synthetic --days 7 --high 60,70,80 --low 20,30 --max-step 1,2,4
+"""
+import argparse
+import ast
+import csv
+import itertools
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import autoscale
+import log_analyzer
+
+# Policy parameters swept by the simulator, mapped to scaling_decision() keyword arguments
+POLICY_PARAMS = ('high', 'low', 'target_cpu', 'max_step', 'max_fleet')
+
+
+def load_log_trace(path):
+    """
+    Build a per-minute demand trace from autoscale.log. Each tick's fleet average CPU is
+    multiplied by the number of running instances and held until the next tick.
+    """
+    samples = []
+    running_count = None
+    with open(path) as f:
+        for line in f:
+            parsed = log_analyzer.parse_line(line)
+            if parsed is None:
+                continue
+            timestamp, _, message = parsed
+            if message.startswith('All running instances: '):
+                running_count = len(ast.literal_eval(message[len('All running instances: '):]))
+            elif message.startswith('Overall average CPU utilization: ') and running_count:
+                avg_cpu = float(message[len('Overall average CPU utilization: '):].rstrip('%'))
+                minute = int(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp() // 60)
+                samples.append((minute, avg_cpu * running_count))
+    if not samples:
+        raise ValueError(f"No CPU decisions found in {path}")
+    return _fill_minutes(samples, hold=True)
+
+
+def load_request_trace(path, cpu_seconds_per_request=0.5, vcpus=2):
+    """
+    Build a per-minute demand trace from a JSON-lines request log. Requests are counted per
+    minute and converted to instance-percent using the CPU cost of one request.
+    """
+    samples = [(int(seconds // 60), count) for seconds, count in log_analyzer.read_request_log(path)]
+    if not samples:
+        raise ValueError(f"No timestamped request records found in {path}")
+    requests_per_minute = _fill_minutes(samples, hold=False)
+    return requests_per_minute / 60 * cpu_seconds_per_request / vcpus * 100
+
+
+def synthetic_trace(days=1, base=40.0, peak=400.0, spikes_per_day=3, seed=0):
+    # Diurnal demand peaking mid-afternoon, with noise and short random spikes.
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(int(days * 1440))
+    daily = 0.5 - 0.5 * np.cos(2 * np.pi * ((minutes % 1440) - 180) / 1440)
+    demand = base + (peak - base) * daily ** 2
+    demand *= rng.normal(1.0, 0.05, len(minutes))
+    for start in rng.integers(0, len(minutes), int(days * spikes_per_day)):
+        demand[start:start + int(rng.integers(10, 45))] += peak * rng.uniform(0.5, 1.5)
+    return np.maximum(demand, 0.0)
+
+
+def _fill_minutes(samples, hold):
+    # Turn (minute, value) samples into a dense per-minute array, holding or summing values.
+    samples.sort()
+    first = samples[0][0]
+    values = np.zeros(samples[-1][0] - first + 1)
+    if hold:
+        for (minute, value), nxt in zip(samples, samples[1:] + [(samples[-1][0] + 1, None)]):
+            values[minute - first:nxt[0] - first] = value
+    else:
+        for minute, value in samples:
+            values[minute - first] += value
+    return values
+
+
+def policy_grid(**choices):
+    # Cartesian product of parameter choices as {name: array}; combinations with low >= high are dropped.
+    names = list(choices)
+    combos = [c for c in itertools.product(*choices.values())
+              if dict(zip(names, c))['low'] < dict(zip(names, c))['high']]
+    if not combos:
+        raise ValueError("No valid policy combinations (low must be below high)")
+    return {name: np.array([c[i] for c in combos]) for i, name in enumerate(names)}
+
+
+def simulate(demand, policies, tick_minutes=3, boot_delay=1.0, health_delay=3.0,
+             min_instances=1, window=5):
+    """
+    Replay `demand` (instance-percent per minute) for every policy in `policies` at once.
+    A launch becomes serving boot_delay + health_delay minutes after the tick that requested
+    it; a scale-in stops instances immediately. Returns per-policy arrays of
+    capacity-minutes (serving plus pending), minutes above the high threshold, saturated
+    minutes (demand above capacity) and scale actions.
+    """
+    demand = np.asarray(demand, dtype=float)
+    count = len(policies['high'])
+    rows = np.arange(count)
+    delay = np.broadcast_to(np.maximum(1, np.ceil(np.asarray(boot_delay) + health_delay)).astype(int), (count,))
+    slots = int(delay.max()) + 1
+
+    serving = np.full(count, min_instances)
+    arrivals = np.zeros((count, slots), dtype=int)
+    history = np.zeros((count, window))
+    capacity_minutes = np.zeros(count)
+    over_threshold = np.zeros(count)
+    saturated = np.zeros(count)
+    actions = np.zeros(count, dtype=int)
+
+    for t, load in enumerate(demand):
+        slot = t % slots
+        serving += arrivals[:, slot]
+        arrivals[:, slot] = 0
+
+        utilization = np.minimum(100.0, load / serving)
+        if t == 0:
+            history[:] = utilization[:, None]
+        history[:, t % window] = utilization
+        pending = arrivals.sum(axis=1)
+
+        capacity_minutes += serving + pending
+        over_threshold += utilization > policies['high']
+        saturated += load > 100.0 * serving
+
+        if t % tick_minutes == 0:
+            avg_cpu = history.mean(axis=1)
+            change = autoscale.scaling_decision(
+                avg_cpu, avg_cpu * serving, serving, pending, serving + pending, serving - min_instances,
+                **{name: policies[name] for name in POLICY_PARAMS}
+            )
+            arrivals[rows, (t + delay) % slots] += np.maximum(change, 0)
+            serving += np.minimum(change, 0)
+            actions += change != 0
+
+    return {
+        'capacity_minutes': capacity_minutes,
+        'minutes_over_threshold': over_threshold,
+        'saturated_minutes': saturated,
+        'scale_actions': actions,
+    }
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',')]
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',')]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--log', help="replay an autoscale.log file")
+    source.add_argument('--requests', help="replay a JSON-lines request log")
+    source.add_argument('--synthetic', action='store_true', help="replay a synthetic diurnal trace")
+
+    parser.add_argument('--days', type=float, default=1, help="length of the synthetic trace")
+    parser.add_argument('--peak', type=float, default=400.0, help="synthetic peak demand (instance-percent)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cpu-seconds-per-request', type=float, default=0.5)
+    parser.add_argument('--vcpus', type=int, default=2)
+
+    parser.add_argument('--high', type=_floats, default=[autoscale.threshold_high])
+    parser.add_argument('--low', type=_floats, default=[autoscale.threshold_low])
+    parser.add_argument('--target-cpu', type=_floats, default=[autoscale.scale_up_target_cpu])
+    parser.add_argument('--max-step', type=_ints, default=[autoscale.max_scale_up_step])
+    parser.add_argument('--max-fleet', type=_ints, default=[autoscale.max_instances])
+
+    parser.add_argument('--tick-minutes', type=int, default=3)
+    parser.add_argument('--boot-delay', type=float, default=1.0, help="minutes from launch to running")
+    parser.add_argument('--health-delay', type=float, default=3.0, help="minutes from running to healthy")
+    parser.add_argument('--sort', choices=['capacity_minutes', 'minutes_over_threshold', 'saturated_minutes', 'scale_actions'],
+                        default='minutes_over_threshold')
+    parser.add_argument('--top', type=int, default=20, help="number of policies to print")
+    parser.add_argument('--csv', help="write every policy's results to this CSV file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.log:
+        demand = load_log_trace(args.log)
+    elif args.requests:
+        demand = load_request_trace(args.requests, args.cpu_seconds_per_request, args.vcpus)
+    else:
+        demand = synthetic_trace(args.days, peak=args.peak, seed=args.seed)
+
+    policies = policy_grid(high=args.high, low=args.low, target_cpu=args.target_cpu,
+                           max_step=args.max_step, max_fleet=args.max_fleet)
+    started = time.perf_counter()
+    results = simulate(demand, policies, args.tick_minutes, args.boot_delay, args.health_delay)
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {len(demand)} minutes x {len(policies['high'])} policies in {elapsed:.2f}s", file=sys.stderr)
+
+    columns = list(POLICY_PARAMS) + list(results)
+    table = {**policies, **results}
+    order = np.lexsort((table['capacity_minutes'], table[args.sort]))
+    print(' '.join(f"{c:>22}" for c in columns))
+    for row in order[:args.top]:
+        print(' '.join(f"{table[c][row]:>22g}" for c in columns))
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in order:
+                writer.writerow([table[c][row] for c in columns])
+
+
+if __name__ == '__main__':
+    main()
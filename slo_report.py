@@ -0,0 +1,172 @@
+"""
+SLO report for load-test runs of locustfile.py.
+
+Each run writes a JSON-lines timeline (see locustfile.py): a header record with the
+scenario name, then one record per bucket with requests, failures, p50/p95/p99
+latency in ms and the user count. This script lines the timelines up with the
+scaling events in the controller log (scale-up, scale-down, instance healthy) and,
+per scenario, reports every SLO breach and how long the service took to recover:
+from the first bucket over the p95 or error-rate objective to the start of
+`--stable` consecutive buckets within it. Log timestamps are local time, so run the
+report in the controller's timezone.
+
+Example:
+    python slo_report.py loadtest_results/*.jsonl --log autoscale.log --slo-p95-ms 1000
+"""
+import argparse
+import json
+from datetime import datetime
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list; None when empty.
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize_bucket(start, response_times, failures, users):
+    # One timeline record for the requests seen in a bucket starting at `start`.
+    response_times = sorted(response_times)
+    return {
+        'time': start,
+        'users': users,
+        'requests': len(response_times),
+        'failures': failures,
+        'error_rate': failures / len(response_times) if response_times else 0.0,
+        'p50': percentile(response_times, 50),
+        'p95': percentile(response_times, 95),
+        'p99': percentile(response_times, 99),
+    }
+
+
+def load_timeline(path):
+    # (header, [bucket, ...]) from a timeline file written by locustfile.py.
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records or 'scenario' not in records[0]:
+        raise ValueError(f"{path} is not a load-test timeline")
+    return records[0], records[1:]
+
+
+def load_scaling_events(path):
+    """
+    [(epoch seconds, event, message)] from a controller log, oldest first, parsed with
+    log_analyzer.py's patterns.
+    """
+    # Imported here: log_analyzer needs NumPy, and locustfile.py loads this module for the
+    # timeline helpers in Locust environments that only have the standard library
+    import log_analyzer
+    event_patterns = [('scale_up', log_analyzer.SCALE_UP), ('scale_down', log_analyzer.SCALE_DOWN),
+                      ('healthy', log_analyzer.HEALTHY)]
+    events = []
+    with open(path, errors='replace') as f:
+        for line in f:
+            parsed = log_analyzer.parse_line(line)
+            if parsed is None:
+                continue
+            timestamp, _, message = parsed
+            for event, pattern in event_patterns:
+                if pattern.match(message):
+                    # A drained scale-in logs "Draining" when decided and "Stopping" once the instances stop
+                    if not message.startswith('SCALE DOWN: Draining'):
+                        events.append((datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp(), event, message))
+                    break
+    return events
+
+
+def breaches_slo(bucket, slo_p95_ms, slo_error_rate):
+    return bucket['requests'] > 0 and (bucket['p95'] > slo_p95_ms or bucket['error_rate'] > slo_error_rate)
+
+
+def incidents(buckets, slo_p95_ms, slo_error_rate, stable=3):
+    """
+    SLO breaches in a timeline as [(breach start, recovery time or None)]. An incident starts at
+    the first breaching bucket and ends at the first of `stable` consecutive compliant buckets;
+    buckets without requests neither breach nor count towards recovery.
+    """
+    found = []
+    breach_start = None
+    compliant_run = []
+    for bucket in buckets:
+        if bucket['requests'] == 0:
+            continue
+        if breaches_slo(bucket, slo_p95_ms, slo_error_rate):
+            if breach_start is None:
+                breach_start = bucket['time']
+            compliant_run = []
+        elif breach_start is not None:
+            compliant_run.append(bucket['time'])
+            if len(compliant_run) >= stable:
+                found.append((breach_start, compliant_run[0]))
+                breach_start, compliant_run = None, []
+    if breach_start is not None:
+        found.append((breach_start, None))
+    return found
+
+
+def report(path, events, slo_p95_ms, slo_error_rate, stable, show_timeline=False):
+    header, buckets = load_timeline(path)
+    started = header['started']
+    ended = buckets[-1]['time'] + header.get('bucket_seconds', 0) if buckets else started
+    requests = sum(b['requests'] for b in buckets)
+    failures = sum(b['failures'] for b in buckets)
+    run_events = [e for e in events if started <= e[0] <= ended]
+
+    lines = [f"Scenario {header['scenario']} ({path}): {ended - started:.0f}s, {requests} requests, "
+             f"error rate {failures / requests if requests else 0:.2%}"]
+    worst = [b for b in buckets if b['requests']]
+    if worst:
+        lines.append(f"  worst bucket p95 {max(b['p95'] for b in worst):.0f} ms, p99 {max(b['p99'] for b in worst):.0f} ms")
+    for kind in ('scale_up', 'scale_down', 'healthy'):
+        offsets = [f"+{t - started:.0f}s" for t, event, _ in run_events if event == kind]
+        lines.append(f"  {kind}: {len(offsets)} {' '.join(offsets)}".rstrip())
+
+    found = incidents(buckets, slo_p95_ms, slo_error_rate, stable)
+    if not found:
+        lines.append(f"  SLO (p95 <= {slo_p95_ms:.0f} ms, errors <= {slo_error_rate:.2%}) held throughout")
+    recoveries = []
+    for breach_start, recovered in found:
+        scale_up = next((t for t, event, _ in run_events if event == 'scale_up' and t >= breach_start), None)
+        detail = f" first scale-up +{scale_up - breach_start:.0f}s after breach" if scale_up is not None else " no scale-up"
+        if recovered is None:
+            lines.append(f"  breach at +{breach_start - started:.0f}s: NOT RECOVERED by end of run;{detail}")
+        else:
+            recoveries.append(recovered - breach_start)
+            lines.append(f"  breach at +{breach_start - started:.0f}s: recovered in {recovered - breach_start:.0f}s;{detail}")
+    if recoveries:
+        lines.append(f"  time to recover: max {max(recoveries):.0f}s, mean {sum(recoveries) / len(recoveries):.0f}s")
+
+    if show_timeline:
+        pending = list(run_events)
+        for bucket in buckets:
+            while pending and pending[0][0] < bucket['time']:
+                lines.append(f"    +{pending[0][0] - started:>6.0f}s  ** {pending.pop(0)[2]}")
+            if bucket['requests']:
+                lines.append(f"    +{bucket['time'] - started:>6.0f}s  users {bucket['users']:>4}  req {bucket['requests']:>5}  "
+                             f"p50 {bucket['p50']:>6.0f}  p95 {bucket['p95']:>6.0f}  p99 {bucket['p99']:>6.0f}  "
+                             f"err {bucket['error_rate']:>6.2%}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('timelines', nargs='+', help="timeline files written by locustfile.py")
+    parser.add_argument('--log', help="controller log to take scaling events from (e.g. autoscale.log)")
+    parser.add_argument('--slo-p95-ms', type=float, default=1000.0)
+    parser.add_argument('--slo-error-rate', type=float, default=0.01)
+    parser.add_argument('--stable', type=int, default=3, help="compliant buckets in a row that count as recovered")
+    parser.add_argument('--timeline', action='store_true', help="print every bucket with scaling events interleaved")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    events = load_scaling_events(args.log) if args.log else []
+    for path in args.timelines:
+        print(report(path, events, args.slo_p95_ms, args.slo_error_rate, args.stable, args.timeline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import autoscale
+
+INSTANCES = [f"i-{n}" for n in range(10)]
+
+
+def fleet_results(cpu, memory):
+    # GetMetricData results for a fleet with every instance at `cpu` and `memory` percent and an idle ALB.
+    return {'CPUUtilization': {i: cpu for i in INSTANCES}, 'mem_used_percent': {i: memory for i in INSTANCES},
+            'requests_per_target': 0.0, 'latency_p95': 0.0, 'latency_p99': 0.0}
+
+
+def test_moderate_memory_does_not_block_scale_in():
+    load, loads = autoscale.policy_load(fleet_results(cpu=4.0, memory=40.0), INSTANCES)
+    assert load == 4.0
+    assert loads['memory'] == 30.0
+    total = load * len(INSTANCES)
+    assert autoscale.scaling_decision(load, total, len(INSTANCES), 0, len(INSTANCES), len(INSTANCES) - 1) < 0
+    change, _ = autoscale.target_tracking_decision(total, len(INSTANCES), 0, len(INSTANCES), len(INSTANCES) - 1)
+    assert change < 0
+
+
+def test_memory_above_its_target_scales_out():
+    load, _ = autoscale.policy_load(fleet_results(cpu=4.0, memory=96.0), INSTANCES)
+    assert load == 72.0
+    total = load * len(INSTANCES)
+    assert autoscale.scaling_decision(load, total, len(INSTANCES), 0, len(INSTANCES), len(INSTANCES) - 1,
+                                      max_fleet=20) > 0
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import bench_tick  # noqa: E402
+
+
+def load_controller(tmp_path, settings):
+    clock = bench_tick.VirtualClock(bench_tick.START)
+    aws = bench_tick.FakeAWS(clock, 0.0, 0.0, 40.0, 20.0, 60.0)
+    return aws, bench_tick.load_controller(aws, clock, str(tmp_path), {'warm_pool_size': 0, **settings})
+
+
+def test_launch_delivers_the_requested_cpu_capacity(tmp_path):
+    aws, controller = load_controller(tmp_path, {})
+    launched = controller.scale_up(80.0, {}, count=4, max_count=4)
+    assert len(launched) <= 4
+    assert controller.capacity_units(launched) >= 4
+
+
+def test_mixed_launch_delivers_the_requested_cpu_capacity(tmp_path):
+    aws, controller = load_controller(tmp_path, {'candidate_instance_types': ['t3.small', 'c5.xlarge']})
+    launched = controller.scale_up(80.0, {}, count=3, max_count=4)
+    assert sorted(aws.instances[i]['type'] for i in launched) == ['c5.xlarge', 't3.small', 't3.small', 't3.small']
+    assert controller.capacity_units(launched) >= 3
+    # A t3.small has a t3.micro's vCPUs, so it adds one unit, not its baseline ratio of two
+    assert controller.capacity_units([i for i in launched if aws.instances[i]['type'] == 't3.small']) == 3
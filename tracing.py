@@ -0,0 +1,185 @@
+"""
+Per-tick profiling for autoscale.py.
+
+Phases of a tick are timed with span(); every AWS API call made through an
+instrumented boto3 client is recorded via botocore event hooks with its latency,
+retry count and throttled attempts. finish_tick() returns the tick's trace, which
+can be appended to a JSON-lines file, written as a Prometheus textfile-collector
+file, or printed as a breakdown (--profile). Trace state is per thread, so ticks of
+several scaling groups running concurrently (multi_group.py) are traced separately.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+THROTTLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled',
+    'RequestThrottledException', 'RequestLimitExceeded', 'TooManyRequestsException', 'SlowDown'
+}
+
+# Trace of the tick in progress on each thread. Phases and calls outside a tick, such as the
+# alert dispatcher thread's SNS publishes, are not recorded, so nothing accumulates between ticks.
+_local = threading.local()
+
+
+def _state():
+    if not hasattr(_local, 'phases'):
+        _local.phases = {}
+        _local.calls = []
+        _local.tick_started = None
+    return _local
+
+
+def start_tick(already_elapsed=0.0):
+    # Begin a tick; `already_elapsed` counts work done before the call (e.g. process startup).
+    _state().tick_started = time.perf_counter() - already_elapsed
+
+
+def record_phase(name, seconds):
+    # Add time to a phase; a phase entered several times in one tick accumulates.
+    state = _state()
+    if state.tick_started is None:
+        return
+    state.phases[name] = state.phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name):
+    # Time the enclosed block as phase `name` of the current tick.
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def finish_tick():
+    """
+    Close the current tick and return its trace:
+    {'timestamp', 'duration', 'phases': {name: seconds}, 'calls': [call, ...]}.
+    """
+    state = _state()
+    started = state.tick_started if state.tick_started is not None else time.perf_counter()
+    trace = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'duration': time.perf_counter() - started,
+        'phases': dict(state.phases),
+        'calls': list(state.calls),
+    }
+    state.phases.clear()
+    state.calls.clear()
+    state.tick_started = None
+    return trace
+
+
+def instrument_client(client):
+    # Register botocore hooks that record every API call made through `client`.
+    client.meta.events.register('before-call', _before_call)
+    client.meta.events.register('after-call', _after_call)
+    client.meta.events.register('after-call-error', _after_call_error)
+    client.meta.events.register('needs-retry', _needs_retry)
+
+
+def _before_call(model, context, **kwargs):
+    context['trace_started'] = time.perf_counter()
+    context['trace_model'] = model
+    context['trace_throttles'] = 0
+
+
+def _record_call(model, context, retries, error):
+    started = context.get('trace_started')
+    state = _state()
+    if started is None or state.tick_started is None:
+        return
+    state.calls.append({
+        'service': model.service_model.service_name,
+        'operation': model.name,
+        'latency': time.perf_counter() - started,
+        'retries': retries,
+        'throttles': context.get('trace_throttles', 0),
+        'error': error,
+    })
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    error = parsed.get('Error', {}).get('Code') if http_response.status_code >= 300 else None
+    _record_call(model, context, parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0), error)
+
+
+def _after_call_error(exception, context, **kwargs):
+    # Connection-level failures never produce a parsed response; take the operation from the context
+    model = context.get('trace_model')
+    if model is not None:
+        _record_call(model, context, 0, type(exception).__name__)
+
+
+def _needs_retry(response=None, request_dict=None, **kwargs):
+    # Called once per attempt; count attempts the service rejected as throttled.
+    if request_dict is None:
+        return None
+    context = request_dict['context']
+    if response is not None:
+        parsed = response[1]
+        if parsed.get('Error', {}).get('Code') in THROTTLE_CODES:
+            context['trace_throttles'] = context.get('trace_throttles', 0) + 1
+    return None
+
+
+def summarize_calls(trace):
+    # {(service, operation): (count, total latency, retries, throttles)} for one tick.
+    summary = {}
+    for call in trace['calls']:
+        key = (call['service'], call['operation'])
+        count, latency, retries, throttles = summary.get(key, (0, 0.0, 0, 0))
+        summary[key] = (count + 1, latency + call['latency'], retries + call['retries'], throttles + call['throttles'])
+    return summary
+
+
+def write_jsonl(trace, path):
+    with open(path, 'a') as f:
+        f.write(json.dumps(trace) + "\n")
+
+
+def write_prometheus(trace, path):
+    # Write the last tick as a node_exporter textfile-collector file (atomically, as the collector requires).
+    lines = [
+        "# HELP autoscaler_tick_duration_seconds Wall time of the last controller tick.",
+        "# TYPE autoscaler_tick_duration_seconds gauge",
+        f"autoscaler_tick_duration_seconds {trace['duration']:.6f}",
+        "# HELP autoscaler_phase_duration_seconds Time spent in each phase of the last tick.",
+        "# TYPE autoscaler_phase_duration_seconds gauge",
+    ]
+    for phase, seconds in sorted(trace['phases'].items()):
+        lines.append(f'autoscaler_phase_duration_seconds{{phase="{phase}"}} {seconds:.6f}')
+    summary = summarize_calls(trace)
+    for metric, index, help_text in (
+        ('autoscaler_aws_calls', 0, "AWS API calls made in the last tick."),
+        ('autoscaler_aws_call_seconds', 1, "Total AWS API call latency in the last tick."),
+        ('autoscaler_aws_call_retries', 2, "AWS API retries in the last tick."),
+        ('autoscaler_aws_call_throttles', 3, "Throttled AWS API attempts in the last tick."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for (service, operation), values in sorted(summary.items()):
+            lines.append(f'{metric}{{service="{service}",operation="{operation}"}} {values[index]:g}')
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def format_breakdown(trace):
+    # Human-readable per-tick breakdown for --profile.
+    lines = [f"Tick {trace['duration'] * 1000:.1f} ms"]
+    for phase, seconds in sorted(trace['phases'].items(), key=lambda item: -item[1]):
+        lines.append(f"  {phase:<22} {seconds * 1000:>9.1f} ms  {seconds / max(trace['duration'], 1e-9):>6.1%}")
+    summary = summarize_calls(trace)
+    if summary:
+        lines.append(f"  {'AWS call':<40} {'count':>5} {'total ms':>9} {'retries':>7} {'throttles':>9}")
+        for (service, operation), (count, latency, retries, throttles) in sorted(summary.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {service + '.' + operation:<40} {count:>5} {latency * 1000:>9.1f} {retries:>7} {throttles:>9}")
+    return "\n".join(lines)